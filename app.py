@@ -1,13 +1,17 @@
+import asyncio
 import streamlit as st
-import cohere
 from datetime import datetime, timedelta, time
-import requests
-import json
-from typing import List, Dict
+from functools import wraps
 
-# Initialize Cohere
-COHERE_API_KEY = ""
-co = cohere.Client(COHERE_API_KEY)
+from energy_model import EnergyModel
+from goal_tracker import AsyncNotionAPI, NotionAPI, SmartScheduler, TaskCache, UserProfile, fetch_and_suggest
+from interval_index import IntervalIndex
+from llm_cache import LLMCache
+from metrics import metrics
+from notion_transport import NotionTransport
+from recurrence import WEEKDAY_NAMES, RecurrenceEngine, RecurrenceRule, RecurrenceStore, RecurringGoal
+from task_mirror import TaskMirror
+from write_queue import QueueFlusher, WriteQueue
 
 # Page config
 st.set_page_config(
@@ -88,310 +92,83 @@ st.markdown("""
         border: 1px solid #647dee;
         background: #f8fafc;
     }
-    .stTabs [data-baseweb="tab-list"] {
+    div[role="radiogroup"] {
         background: #e0e7ff;
         border-radius: 8px;
         padding: 0.5em;
     }
-    .stTabs [data-baseweb="tab"] {
+    div[role="radiogroup"] label {
         font-weight: 600;
         color: #7f53ac;
     }
-    .stTabs [aria-selected="true"] {
-        color: #fff;
-        background: linear-gradient(90deg, #7f53ac 0%, #647dee 100%);
-        border-radius: 8px;
-    }
 </style>
 """, unsafe_allow_html=True)
 
 
-class NotionAPI:
-    """Notion API Integration"""
-    
-    def __init__(self, api_key: str, database_id: str):
-        self.api_key = api_key
-        self.database_id = database_id.strip().replace('-', '')
-        self.headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "Notion-Version": "2022-06-28"
-        }
-    
-    def test_connection(self) -> tuple:
-        """Test if connection to database works"""
-        url = f"https://api.notion.com/v1/databases/{self.database_id}"
-        
-        try:
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
-                return True, "Connection successful!"
-            elif response.status_code == 401:
-                return False, "Invalid API token. Check your integration token."
-            elif response.status_code == 404:
-                return False, "Database not found. Check your Database ID or make sure you shared the database with the integration."
-            else:
-                error_data = response.json()
-                return False, f"Error {response.status_code}: {error_data.get('message', 'Unknown error')}"
-        
-        except Exception as e:
-            return False, f"Connection error: {str(e)}"
-    
-    def create_task(self, activity: str, date: str, time_str: str, duration: int, 
-                    energy: str, category: str = "Personal") -> tuple:
-        """Create a new task in Notion database"""
-        
-        url = "https://api.notion.com/v1/pages"
-        
-        data = {
-            "parent": {"database_id": self.database_id},
-            "properties": {
-                "Activity": {
-                    "title": [
-                        {
-                            "text": {
-                                "content": activity
-                            }
-                        }
-                    ]
-                },
-                "Date": {
-                    "date": {
-                        "start": date
-                    }
-                },
-                "Time": {
-                    "rich_text": [
-                        {
-                            "text": {
-                                "content": time_str
-                            }
-                        }
-                    ]
-                },
-                "Duration": {
-                    "number": duration
-                },
-                "Energy": {
-                    "select": {
-                        "name": energy
-                    }
-                },
-                "Status": {
-                    "select": {
-                        "name": "📝 Planned"
-                    }
-                },
-                "Category": {
-                    "select": {
-                        "name": category
-                    }
-                }
-            }
-        }
-        
-        try:
-            response = requests.post(url, headers=self.headers, json=data)
-            
-            if response.status_code == 200:
-                return True, "Task successfully added to Notion!"
-            else:
-                error_data = response.json()
-                error_msg = error_data.get('message', 'Unknown error')
-                
-                return False, f"Error {response.status_code}: {error_msg}\n\nFull response: {json.dumps(error_data, indent=2)}"
-        
-        except Exception as e:
-            return False, f"Request error: {str(e)}"
-    
-    def get_tasks(self, date: str = None) -> tuple:
-        """Get tasks from Notion database"""
-        
-        url = f"https://api.notion.com/v1/databases/{self.database_id}/query"
-        
-        data = {}
-        if date:
-            data = {
-                "filter": {
-                    "property": "Date",
-                    "date": {
-                        "equals": date
-                    }
-                }
-            }
-        
-        try:
-            response = requests.post(url, headers=self.headers, json=data)
-            
-            if response.status_code == 200:
-                results = response.json().get('results', [])
-                
-                tasks = []
-                for result in results:
-                    props = result['properties']
-                    
-                    activity = props.get('Activity', {}).get('title', [{}])[0].get('text', {}).get('content', 'Untitled')
-                    time_str = props.get('Time', {}).get('rich_text', [{}])[0].get('text', {}).get('content', '')
-                    duration = props.get('Duration', {}).get('number', 0)
-                    energy = props.get('Energy', {}).get('select', {}).get('name', 'Medium') if props.get('Energy', {}).get('select') else 'Medium'
-                    status = props.get('Status', {}).get('select', {}).get('name', 'Planned') if props.get('Status', {}).get('select') else 'Planned'
-                    
-                    tasks.append({
-                        'activity': activity,
-                        'time': time_str,
-                        'duration': duration,
-                        'energy': energy,
-                        'status': status
-                    })
-                
-                return True, tasks
-            else:
-                error_data = response.json()
-                return False, f"Error fetching tasks: {error_data.get('message', 'Unknown error')}"
-        
-        except Exception as e:
-            return False, f"Error: {str(e)}"
+@st.cache_resource
+def get_notion_transport(api_key: str) -> NotionTransport:
+    """One pooled keep-alive transport per token for the whole process"""
+    return NotionTransport(api_key)
 
 
-class UserProfile:
-    """Store user's daily routine"""
-    def __init__(self):
-        self.sleep_time = time(23, 0)
-        self.wake_time = time(7, 0)
-        self.work_start = time(9, 0)
-        self.work_end = time(17, 0)
-        self.commute_to_work = 30
-        self.commute_from_work = 30
-        self.high_energy_periods = [(time(9, 0), time(11, 30))]
-        self.low_energy_periods = [(time(14, 0), time(15, 30))]
+@st.cache_resource
+def get_task_mirror(path: str = "notion_mirror.db") -> TaskMirror:
+    """Local SQLite mirror of the task database, shared by the whole process"""
+    return TaskMirror(path)
 
 
-class SmartScheduler:
-    """AI-powered scheduler"""
-    
-    def __init__(self, profile: UserProfile):
-        self.profile = profile
-    
-    def find_free_slots(self, date: datetime, existing_tasks: List[Dict], min_duration: int = 30) -> List[Dict]:
-        """Find free time slots"""
-        day_start = datetime.combine(date.date(), self.profile.wake_time)
-        day_end = datetime.combine(date.date(), self.profile.sleep_time)
-        
-        busy_periods = []
-        
-        work_start = datetime.combine(date.date(), self.profile.work_start)
-        work_end = datetime.combine(date.date(), self.profile.work_end)
-        leave_time = work_start - timedelta(minutes=self.profile.commute_to_work)
-        arrive_time = work_end + timedelta(minutes=self.profile.commute_from_work)
-        busy_periods.append((leave_time, arrive_time))
-        
-        for task in existing_tasks:
-            if task['time']:
-                try:
-                    task_time = datetime.strptime(task['time'], '%I:%M %p').time()
-                    task_start = datetime.combine(date.date(), task_time)
-                    task_end = task_start + timedelta(minutes=task['duration'])
-                    busy_periods.append((task_start, task_end))
-                except:
-                    pass
-        
-        busy_periods.sort(key=lambda x: x[0])
-        
-        free_slots = []
-        current_time = day_start
-        
-        for busy_start, busy_end in busy_periods:
-            if current_time < busy_start:
-                duration = (busy_start - current_time).seconds // 60
-                if duration >= min_duration:
-                    free_slots.append({
-                        'start': current_time,
-                        'end': busy_start,
-                        'duration': duration,
-                        'energy': self._get_energy_level(current_time.time())
-                    })
-            current_time = max(current_time, busy_end)
-        
-        if current_time < day_end:
-            duration = (day_end - current_time).seconds // 60
-            if duration >= min_duration:
-                free_slots.append({
-                    'start': current_time,
-                    'end': day_end,
-                    'duration': duration,
-                    'energy': self._get_energy_level(current_time.time())
-                })
-        
-        return free_slots
-    
-    def _get_energy_level(self, check_time: time) -> str:
-        """Determine energy level"""
-        for start, end in self.profile.high_energy_periods:
-            if start <= check_time <= end:
-                return "High"
-        
-        for start, end in self.profile.low_energy_periods:
-            if start <= check_time <= end:
-                return "Low"
-        
-        return "Medium"
-    
-    def suggest_optimal_slot(self, activity: str, duration: int, free_slots: List[Dict], priority: str = "medium") -> Dict:
-        """Use AI to suggest best time slot"""
-        
-        if not free_slots:
-            return {"error": "No free slots available"}
-        
-        slots_description = "\n".join([
-            f"{i+1}. {s['start'].strftime('%I:%M %p')} - {s['end'].strftime('%I:%M %p')}, "
-            f"Duration: {s['duration']} min, Energy: {s['energy']}"
-            for i, s in enumerate(free_slots)
-        ])
-        
-        prompt = f"""Suggest the BEST time slot for this activity.
+@st.cache_resource
+def get_llm_cache(path: str = "llm_cache.db") -> LLMCache:
+    """Slot suggestions memoized across reruns and restarts"""
+    return LLMCache(max_size=512, ttl=24 * 3600, path=path)
 
-Activity: {activity}
-Required Duration: {duration} minutes
-Priority: {priority}
 
-Available Slots:
-{slots_description}
+@st.cache_resource
+def get_task_cache(ttl: float = 60.0) -> TaskCache:
+    """Process-wide task cache shared across reruns, tabs and sessions"""
+    return TaskCache(ttl)
 
-High Energy: {[(s.strftime('%H:%M'), e.strftime('%H:%M')) for s, e in self.profile.high_energy_periods]}
-Low Energy: {[(s.strftime('%H:%M'), e.strftime('%H:%M')) for s, e in self.profile.low_energy_periods]}
 
-Respond with:
-SLOT: [number]
-REASON: [brief explanation]"""
-        
-        response = co.chat(message=prompt, model="command-r-08-2024")
-        
-        try:
-            slot_num = 0
-            reason = ""
-            for line in response.text.split('\n'):
-                if 'SLOT:' in line:
-                    slot_num = int(line.split(':')[1].strip()) - 1
-                elif 'REASON:' in line:
-                    reason = line.split(':', 1)[1].strip()
-            
-            if 0 <= slot_num < len(free_slots):
-                return {
-                    "slot": free_slots[slot_num],
-                    "reason": reason,
-                    "all_slots": free_slots
-                }
-        except:
-            pass
-        
-        for slot in free_slots:
-            if slot["energy"] == "High":
-                return {"slot": slot, "reason": "High energy period", "all_slots": free_slots}
-        
-        return {"slot": free_slots[0], "reason": "First available", "all_slots": free_slots}
+@st.cache_resource
+def get_recurrence_store(path: str = "recurring_goals.db") -> RecurrenceStore:
+    """Repeating goals and how far ahead each has been scheduled"""
+    return RecurrenceStore(path)
+
+
+@st.cache_resource
+def get_write_queue(path: str = "notion_writes.db") -> WriteQueue:
+    """Durable queue of tasks waiting to be created in Notion"""
+    return WriteQueue(path)
+
+
+@st.cache_resource
+def get_interval_index(database_id: str) -> IntervalIndex:
+    """Known tasks by day, so every session sees the others' creates before posting"""
+    return IntervalIndex()
+
+
+@st.cache_resource
+def get_energy_model(database_id: str) -> EnergyModel:
+    """Energy curve learned from the mirrored history; later syncs keep it current"""
+    return EnergyModel().fit(get_task_mirror().get_tasks(database_id))
 
 
+@st.cache_resource
+def get_write_flusher(database_id: str, _api: NotionAPI) -> QueueFlusher:
+    """Background thread that sends a database's queued tasks, one per process"""
+    # Shares the session client's stores, so pages it syncs into the mirror also reach the energy model
+    api = NotionAPI(_api.api_key, database_id, cache=_api.cache, transport=_api.transport, mirror=_api.mirror,
+                    index=_api.index, energy_model=_api.energy_model)
+    return QueueFlusher(_api.write_queue, api).start()
+
+
+# Timings are collected per session; the toggle is in the sidebar's Diagnostics
+if "collect_timings" not in st.session_state:
+    st.session_state.collect_timings = metrics.enabled
+if "log_events" not in st.session_state:
+    st.session_state.log_events = metrics.log_events
+rerun_scope = metrics.begin_rerun(enabled=st.session_state.collect_timings, log_events=st.session_state.log_events)
+
 # Initialize session state
 if "profile" not in st.session_state:
     st.session_state.profile = UserProfile()
@@ -400,7 +177,14 @@ if "notion_api" not in st.session_state:
     # Credentials should be set via environment variables or user input
     NOTION_TOKEN = "YOUR_NOTION_TOKEN_HERE"
     DATABASE_ID = "YOUR_DATABASE_ID_HERE"
-    st.session_state.notion_api = NotionAPI(NOTION_TOKEN, DATABASE_ID)
+    st.session_state.notion_api = NotionAPI(NOTION_TOKEN, DATABASE_ID, cache=get_task_cache(),
+                                             transport=get_notion_transport(NOTION_TOKEN),
+                                             mirror=get_task_mirror(), write_queue=get_write_queue(),
+                                             index=get_interval_index(DATABASE_ID.strip().replace('-', '')),
+                                             energy_model=get_energy_model(DATABASE_ID.strip().replace('-', '')))
+
+if st.session_state.notion_api.write_queue is not None:
+    get_write_flusher(st.session_state.notion_api.database_id, st.session_state.notion_api)
 
 if "notion_configured" not in st.session_state:
     st.session_state.notion_configured = True  # Auto-configured
@@ -452,16 +236,242 @@ with st.sidebar:
         low_start = st.time_input("Low Energy Start", time(14, 0))
         low_end = st.time_input("Low Energy End", time(15, 30))
         st.session_state.profile.low_energy_periods = [(low_start, low_end)]
+        
+        energy_model = st.session_state.notion_api.energy_model
+        st.session_state.learn_energy = st.checkbox(
+            "Learn from my task history", value=st.session_state.get("learn_energy", True),
+            help="Times you usually finish tasks count as high energy; the windows above fill the gaps."
+        )
+        if energy_model is not None and st.session_state.learn_energy:
+            st.caption(f"Learned from {energy_model.samples:,} past tasks")
     
     st.markdown("---")
     # Removed reconfigure button since credentials are hardcoded
+    
+    write_queue = st.session_state.notion_api.write_queue
+    if write_queue is not None:
+        database_id = st.session_state.notion_api.database_id
+        writes = write_queue.counts(database_id)
+        st.caption(f"📮 Notion writes: {writes['pending'] + writes['sending']} pending, {writes['failed']} failed")
+        if writes["failed"]:
+            with st.expander("⚠️ Failed writes"):
+                for entry in write_queue.failed(database_id):
+                    st.caption(f"{entry['task']['activity']} ({entry['task']['date']} {entry['task']['time_str']}): "
+                               f"{entry['error']}")
+                if st.button("Retry", key="retry_writes"):
+                    write_queue.retry_failed(database_id)
+    
+    llm_stats = get_llm_cache().stats()
+    st.caption(f"🧠 Suggestion cache: {llm_stats['hits']} hits / {llm_stats['misses']} misses")
+    
+    with st.expander("🩺 Diagnostics"):
+        st.toggle("Collect timings", key="collect_timings", help="For this session's reruns")
+        st.toggle("Log JSON events", key="log_events",
+                  help="One JSON line per timed call on stderr while this session collects timings")
+        
+        if st.session_state.collect_timings:
+            last_rerun = st.session_state.get("last_rerun")
+            if last_rerun:
+                st.caption(f"Last {'view' if last_rerun.get('fragment') else 'rerun'}: "
+                           f"{last_rerun['seconds'] * 1000:.0f} ms, {last_rerun['notion_requests']} Notion requests")
+            
+            snapshot = metrics.snapshot()
+            if snapshot["timers"]:
+                st.dataframe([
+                    {
+                        "metric": timer["name"],
+                        "labels": ", ".join(f"{k}={v}" for k, v in timer["labels"].items()),
+                        "calls": timer["count"],
+                        "avg ms": round(timer["avg_seconds"] * 1000, 1),
+                        "max ms": round(timer["max_seconds"] * 1000, 1)
+                    }
+                    for timer in snapshot["timers"]
+                ], hide_index=True)
+            if snapshot["counters"]:
+                st.dataframe([
+                    {
+                        "counter": counter["name"],
+                        "labels": ", ".join(f"{k}={v}" for k, v in counter["labels"].items()),
+                        "value": counter["value"]
+                    }
+                    for counter in snapshot["counters"]
+                ], hide_index=True)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("Prometheus", metrics.to_prometheus(), "metrics.prom", "text/plain")
+            with col2:
+                st.download_button("JSON", metrics.to_json(), "metrics.json", "application/json")
+            if st.button("Reset", key="reset_metrics"):
+                metrics.reset()
+
+# Views re-run on their own when their widgets change (older Streamlit: the whole script does)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def view_fragment(func):
+    """A fragment whose own reruns are timed and counted like full reruns
+    
+    Fragment reruns skip the top and bottom of the script, so they open
+    their own metrics scope; during a full rerun they join its scope.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        with metrics.rerun(enabled=st.session_state.get("collect_timings", metrics.enabled),
+                           log_events=st.session_state.get("log_events", metrics.log_events),
+                           fragment=func.__name__) as scope:
+            result = func(*args, **kwargs)
+        if scope.summary:
+            st.session_state.last_rerun = scope.summary
+        return result
+    return fragment(run)
+
+
+scheduler = SmartScheduler(st.session_state.profile, llm_cache=get_llm_cache(),
+                           energy_model=st.session_state.notion_api.energy_model
+                           if st.session_state.get("learn_energy", True) else None)
+
+
+def load_todays_tasks(refresh: bool = False) -> tuple:
+    """Today's tasks, fetched once per session and day
+    
+    Routine changes in the sidebar rerun the script but reuse these, so
+    only the free slots are recomputed.
+    """
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    loaded = st.session_state.get("todays_tasks")
+    if refresh or not loaded or loaded[0] != today_str:
+        success, result = st.session_state.notion_api.get_tasks(today_str, use_cache=not refresh)
+        if not success:
+            return False, result
+        st.session_state.todays_tasks = (today_str, result)
+    
+    tasks = st.session_state.todays_tasks[1]
+    write_queue = st.session_state.notion_api.write_queue
+    if write_queue is not None:
+        # Queued tasks count as busy before Notion has them
+        loaded_ids = {task.id for task in tasks}
+        tasks = tasks + [task for task in write_queue.unsynced_tasks(st.session_state.notion_api.database_id, today_str)
+                         if task.id is None or task.id not in loaded_ids]
+    return True, tasks
+
+
+def advance_recurring_goals(force: bool = False) -> dict:
+    """Schedule repeating goals up to 14 days ahead, once per session and day unless forced
+    
+    Only occurrences past each goal's watermark are placed, so this usually
+    does nothing and makes no Notion requests.
+    """
+    today = datetime.now().date()
+    if not force and st.session_state.get("recurrence_checked") == today:
+        return {}
+    st.session_state.recurrence_checked = today
+    report = RecurrenceEngine(get_recurrence_store()).advance(st.session_state.notion_api, scheduler, today)
+    if report["created"]:
+        forget_loaded_tasks()
+    return report
 
-# Main Tabs
-tab1, tab2, tab3 = st.tabs(["🎯 Add New Goal", "📊 Today's Schedule", "📝 View Notion Tasks"])
 
-scheduler = SmartScheduler(st.session_state.profile)
+def prefetch_day() -> dict:
+    """Advance repeating goals and load today's tasks together on a session's first rerun of the day
+    
+    Both wait on Notion, so they run concurrently; the tasks are only kept
+    if no repeating session was just placed today.
+    """
+    today = datetime.now().date()
+    if st.session_state.get("recurrence_checked") == today:
+        return {}
+    st.session_state.recurrence_checked = today
+    today_str = today.strftime("%Y-%m-%d")
+    api = st.session_state.notion_api
+    
+    async def both():
+        engine = RecurrenceEngine(get_recurrence_store())
+        return await asyncio.gather(asyncio.to_thread(engine.advance, api, scheduler, today),
+                                    AsyncNotionAPI(api).get_tasks(today_str))
+    
+    report, (success, tasks) = asyncio.run(both())
+    if report["created"]:
+        forget_loaded_tasks()
+    elif success:
+        st.session_state.todays_tasks = (today_str, tasks)
+    return report
 
-with tab1:
+
+def iterate_async(agen):
+    """Drive an async generator from the script thread, one item at a time"""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+
+def forget_loaded_tasks():
+    """Drop the session's task lists after a write so the views reload them"""
+    st.session_state.pop("todays_tasks", None)
+    st.session_state.pop("task_query", None)
+
+
+def recurring_goals_panel():
+    database_id = st.session_state.notion_api.database_id
+    store = get_recurrence_store()
+    
+    for goal in store.goals(database_id):
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            until = f" · scheduled through {goal.materialized_until.strftime('%d %b')}" if goal.materialized_until else ""
+            st.markdown(f"**{goal.activity}** — {goal.duration} min, {goal.rule.describe()}{until}")
+        with col2:
+            if st.button("🗑️", key=f"remove_{goal.goal_id}"):
+                store.remove(goal.goal_id)
+                st.rerun()
+    
+    with st.form("new_recurring_goal", clear_on_submit=True):
+        activity = st.text_input("Activity", placeholder="e.g., Gym, Study Arabic NLP")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            duration = st.slider("Duration (minutes)", 15, 180, 60, 15)
+        with col2:
+            priority = st.selectbox("Priority", ["High", "Medium", "Low"])
+        with col3:
+            category = st.selectbox("Category", ["Personal", "Work", "Health", "Learning", "Social"])
+        repeat = st.radio("Repeat", ["Daily", "Times per week", "On weekdays"], horizontal=True)
+        times_per_week = st.slider("Times per week", 1, 6, 3)
+        weekdays = st.multiselect("Weekdays", WEEKDAY_NAMES, default=["Mon", "Wed", "Fri"])
+        
+        if st.form_submit_button("➕ Add Repeating Goal") and activity:
+            if repeat == "Daily":
+                rule = RecurrenceRule("daily")
+            elif repeat == "Times per week":
+                rule = RecurrenceRule("weekly", times_per_week=times_per_week)
+            else:
+                rule = RecurrenceRule("weekly", weekdays=tuple(WEEKDAY_NAMES.index(day) for day in weekdays))
+            store.save(database_id, RecurringGoal(activity, duration, rule, priority, category))
+            st.rerun()
+    
+    if st.button("🔁 Schedule Next 14 Days", key="advance_recurring"):
+        with st.spinner("Placing repeating goals..."):
+            report = advance_recurring_goals(force=True)
+        if report.get("error"):
+            st.error(f"❌ {report['error']}")
+        elif not (report.get("created") or report.get("skipped") or report.get("failed")):
+            st.info("Everything in the next 14 days is already scheduled")
+        else:
+            st.success(f"🎉 Added {len(report['created'])} sessions to Notion")
+        for activity, day in report.get("skipped", []):
+            st.warning(f"No room for {activity} on {day.strftime('%a %d %b')}")
+        for activity, day, error in report.get("failed", []):
+            st.error(f"❌ {activity} on {day.strftime('%a %d %b')}: {error}")
+
+
+@view_fragment
+def add_goal_view():
     st.header("🎯 Add New Goal to Notion")
     
     activity_name = st.text_input("What do you want to do?", 
@@ -479,35 +489,36 @@ with tab1:
     find_time_clicked = st.button("🔍 Find Best Time", type="primary", key="find_time")
     
     if find_time_clicked and activity_name:
-        with st.spinner("🤖 AI is analyzing your schedule..."):
-            today_str = datetime.now().strftime("%Y-%m-%d")
-            success, result = st.session_state.notion_api.get_tasks(today_str)
-            
-            if success:
-                existing_tasks = result
-                free_slots = scheduler.find_free_slots(datetime.now(), existing_tasks, duration)
-                
-                if free_slots:
-                    suggestion = scheduler.suggest_optimal_slot(activity_name, duration, free_slots, priority.lower())
-                    slot = suggestion["slot"]
-                    
-                    # Store in session state
-                    st.session_state.current_slot = slot
-                    st.session_state.current_activity = activity_name
-                    st.session_state.current_duration = duration
-                    st.session_state.current_category = category
-                    
-                    st.markdown(f"""
-                    <div class="success-box">
-                    <h3>🎯 AI Recommended Time</h3>
-                    <p><strong>Time:</strong> {slot['start'].strftime('%I:%M %p')} - {slot['end'].strftime('%I:%M %p')}</p>
-                    <p><strong>Duration:</strong> {duration} minutes</p>
-                    <p><strong>Energy Level:</strong> {slot['energy']}</p>
-                    <p><strong>Why this time?</strong> {suggestion['reason']}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.error("❌ No free slots available today!")
+        # Today's tasks load and the recommendation streams in the same pass; the reason fills in after the SLOT line
+        api = st.session_state.notion_api
+        busy = api.write_queue.unsynced_tasks(api.database_id, datetime.now().strftime("%Y-%m-%d")) \
+            if api.write_queue is not None else ()
+        box = st.empty()
+        box.info("🤖 AI is analyzing your schedule...")
+        suggestion = None
+        for suggestion in iterate_async(fetch_and_suggest(AsyncNotionAPI(api), scheduler, activity_name, duration,
+                                                          priority.lower(), category, busy=busy)):
+            if "error" in suggestion:
+                box.error(f"❌ {suggestion['error']}")
+                break
+            slot = suggestion["slot"]
+            box.markdown(f"""
+            <div class="success-box">
+            <h3>🎯 AI Recommended Time</h3>
+            <p><strong>Time:</strong> {slot['start'].strftime('%I:%M %p')} - {slot['end'].strftime('%I:%M %p')}</p>
+            <p><strong>Duration:</strong> {duration} minutes</p>
+            <p><strong>Energy Level:</strong> {slot['energy']}</p>
+            <p><strong>Confidence:</strong> {suggestion['confidence']:.0f}%</p>
+            <p><strong>Why this time?</strong> {suggestion['reason'] or '…'}</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        if suggestion is not None and "error" not in suggestion:
+            # Store in session state
+            st.session_state.current_slot = suggestion["slot"]
+            st.session_state.current_activity = activity_name
+            st.session_state.current_duration = duration
+            st.session_state.current_category = category
     
     # Add button - completely separate
     if hasattr(st.session_state, 'current_slot'):
@@ -531,14 +542,87 @@ with tab1:
                     st.markdown(f"[✅ Open your Notion database](https://www.notion.so/f2f110b34c084f9b9e68bfbe1d769ea8)")
                     # Clear session
                     del st.session_state.current_slot
+                    forget_loaded_tasks()
                 else:
                     st.error("❌ " + message)
+                    if message.startswith("Overlaps"):
+                        # The slot was taken since it was suggested; the next search sees the new task
+                        del st.session_state.current_slot
+                        forget_loaded_tasks()
+    
+    with st.expander("📋 Plan Several Goals at Once"):
+        goals_text = st.text_area(
+            "One goal per line: activity, duration (min), priority, category",
+            placeholder="Study Arabic NLP, 120, High, Learning\nGym, 60, Medium, Health"
+        )
+        
+        if st.button("🧩 Schedule All", key="schedule_all") and goals_text.strip():
+            goals = []
+            for line in goals_text.strip().splitlines():
+                parts = [part.strip() for part in line.split(',')]
+                try:
+                    goals.append({
+                        'activity': parts[0],
+                        'duration': int(parts[1]) if len(parts) > 1 else 60,
+                        'priority': parts[2] if len(parts) > 2 else "Medium",
+                        'category': parts[3] if len(parts) > 3 else "Personal"
+                    })
+                except ValueError:
+                    st.warning(f"Skipping line with invalid duration: {line}")
+            
+            today_str = datetime.now().strftime("%Y-%m-%d")
+            success, result = st.session_state.notion_api.get_tasks(today_str)
+            if success:
+                with st.spinner("🤖 Packing your goals..."):
+                    st.session_state.batch_plan = scheduler.schedule_goals(goals, result, datetime.now(), use_llm=True)
+            else:
+                st.error(f"❌ {result}")
+        
+        if "batch_plan" in st.session_state:
+            plan = st.session_state.batch_plan
+            for placement in plan["placements"]:
+                slot = placement["slot"]
+                st.markdown(f"""
+                <div class="slot-card">
+                <strong>{placement['goal']['activity']}</strong> — {slot['start'].strftime('%I:%M %p')} - {slot['end'].strftime('%I:%M %p')} | ⚡ {slot['energy']}<br>
+                {placement['reason']}
+                </div>
+                """, unsafe_allow_html=True)
+            for goal in plan["unscheduled"]:
+                st.warning(f"No room left today for {goal['activity']}")
+            
+            if plan["placements"] and st.button("📝 ADD ALL TO NOTION", key="add_all"):
+                with st.spinner("Adding to Notion..."):
+                    results = st.session_state.notion_api.create_tasks([
+                        {
+                            'activity': p['goal']['activity'],
+                            'date': p['slot']['start'].strftime("%Y-%m-%d"),
+                            'time_str': p['slot']['start'].strftime('%I:%M %p'),
+                            'duration': p['slot']['duration'],
+                            'energy': p['slot']['energy'],
+                            'category': p['goal']['category']
+                        }
+                        for p in plan["placements"]
+                    ])
+                failed = [r for r in results if not r.success]
+                if failed:
+                    for r in failed:
+                        st.error(f"❌ {plan['placements'][r.index]['goal']['activity']}: {r.error}")
+                else:
+                    st.success(f"🎉 Added {len(results)} tasks to Notion!")
+                    del st.session_state.batch_plan
+                if any(r.success for r in results):
+                    forget_loaded_tasks()
+    
+    with st.expander("🔁 Repeating Goals"):
+        recurring_goals_panel()
 
-with tab2:
+@view_fragment
+def schedule_view():
     st.header("📊 Today's Schedule")
     
     today_str = datetime.now().strftime("%Y-%m-%d")
-    success, result = st.session_state.notion_api.get_tasks(today_str)
+    success, result = load_todays_tasks(refresh=st.button("🔄 Refresh", key="refresh_today"))
     
     if not success:
         st.error(f"❌ {result}")
@@ -551,12 +635,13 @@ with tab2:
             st.subheader("📋 Your Tasks from Notion")
             if existing_tasks:
                 for task in existing_tasks:
-                    date_display = task.get('date', today_str) if 'date' in task else today_str
+                    date_display = task.date or today_str
+                    warning = f"<br>⚠️ {task.error} — not counted as busy time" if task.error else ""
                     st.markdown(f"""
                     <div class="slot-card">
                     <strong>{task['activity']}</strong><br>
                     📅 {date_display} | ⏰ {task['time']} | ⏱️ {task['duration']} min | ⚡ {task['energy']}<br>
-                    Status: {task['status']}
+                    Status: {task['status']}{warning}
                     </div>
                     """, unsafe_allow_html=True)
             else:
@@ -576,35 +661,111 @@ with tab2:
                     """, unsafe_allow_html=True)
             else:
                 st.warning("No free slots available!")
+    
+    with st.expander("🗓️ Plan Ahead"):
+        horizon = st.selectbox("Planning horizon", [7, 14, 30], format_func=lambda d: f"Next {d} days")
+        if st.button("📆 Show Free Time", key="plan_ahead"):
+            start_day = datetime.now().date()
+            end_day = start_day + timedelta(days=horizon - 1)
+            success, result = st.session_state.notion_api.get_tasks_range(
+                start_day.strftime("%Y-%m-%d"), end_day.strftime("%Y-%m-%d"))
+            
+            if not success:
+                st.error(f"❌ {result}")
+            else:
+                free_by_day = scheduler.find_free_slots_range(start_day, end_day, result, 30)
+                for day, day_slots in free_by_day.items():
+                    free_minutes = sum(slot['duration'] for slot in day_slots)
+                    st.markdown(f"**{day.strftime('%a %d %b')}** — {len(day_slots)} slots, "
+                                f"{free_minutes // 60}h {free_minutes % 60}m free")
 
-with tab3:
+@view_fragment
+def all_tasks_view():
     st.header("📝 All Tasks from Notion")
+    api = st.session_state.notion_api
     
-    if st.button("🔄 Refresh from Notion"):
-        st.rerun()
-    
-    success, result = st.session_state.notion_api.get_tasks()
-    
-    if not success:
-        st.error(f"❌ {result}")
-    else:
-        all_tasks = result
-        
-        if all_tasks:
-            for task in all_tasks:
-                col1, col2, col3 = st.columns([3, 2, 1])
-                with col1:
-                    st.write(f"**{task['activity']}**")
-                with col2:
-                    st.write(f"⏰ {task['time']} | ⏱️ {task['duration']} min")
-                with col3:
-                    st.write(task['status'])
+    try:
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+        with col1:
+            status = st.selectbox("Status", ["All"] + api.select_options("Status"), key="task_status")
+        with col2:
+            category = st.selectbox("Category", ["All"] + api.select_options("Category"), key="task_category")
+        with col3:
+            sort = st.selectbox("Sort by", list(NotionAPI.SORT_PROPERTIES), format_func=str.title, key="task_sort")
+        with col4:
+            page_size = st.selectbox("Rows", [25, 50, 100], key="task_page_size")
+        descending = st.toggle("Descending", key="task_descending")
+        refresh_clicked = st.button("🔄 Refresh from Notion")
+        
+        # Filters and sorting run in the mirror or in Notion; only the visible page is fetched and drawn.
+        # Cursors of the pages visited so far make Previous work without re-reading from the start.
+        query = (status, category, sort, descending, page_size)
+        if refresh_clicked or st.session_state.get("task_query") != query:
+            st.session_state.task_query = query
+            st.session_state.task_cursors = [None]
+            st.session_state.task_pages = {}
+        cursors = st.session_state.task_cursors
+        
+        def load_page(cursor):
+            if cursor not in st.session_state.task_pages:
+                st.session_state.task_pages[cursor] = api.query_page(
+                    None if status == "All" else status, None if category == "All" else category,
+                    sort, descending, page_size, cursor, use_cache=not refresh_clicked)
+            return st.session_state.task_pages[cursor]
+        
+        page = load_page(cursors[-1])
+        col1, col2, col3 = st.columns([1, 1, 4])
+        with col1:
+            if st.button("⬅️ Previous", disabled=len(cursors) == 1, key="task_prev"):
+                cursors.pop()
+                page = load_page(cursors[-1])
+        with col2:
+            if st.button("Next ➡️", disabled=page["next_cursor"] is None, key="task_next"):
+                cursors.append(page["next_cursor"])
+                page = load_page(cursors[-1])
+        
+        if page["tasks"]:
+            st.dataframe([
+                {
+                    "Activity": task.activity,
+                    "Date": task.date[:10],
+                    "Time": task.time,
+                    "Duration (min)": task.duration,
+                    "Energy": task.energy,
+                    "Category": task.category,
+                    "Status": task.status
+                }
+                for task in page["tasks"]
+            ], hide_index=True)
+            
+            first = (len(cursors) - 1) * page_size + 1
+            shown = f"rows {first}–{first + len(page['tasks']) - 1}"
+            with col3:
+                st.caption(f"Page {len(cursors)} · {shown}" + (f" of {page['total']}" if page["total"] is not None else ""))
         else:
             st.info("No tasks found in Notion database")
+    except Exception as e:
+        st.error(f"❌ Error fetching tasks: {e}")
+
+
+report = prefetch_day()
+if report.get("created"):
+    st.toast(f"🔁 Scheduled {len(report['created'])} repeating sessions for the next 14 days")
+
+# Only the selected view runs, so it alone queries Notion
+VIEWS = {
+    "🎯 Add New Goal": add_goal_view,
+    "📊 Today's Schedule": schedule_view,
+    "📝 View Notion Tasks": all_tasks_view
+}
+view = st.radio("View", list(VIEWS), horizontal=True, key="view", label_visibility="collapsed")
+VIEWS[view]()
 
 st.markdown("---")
 st.markdown("""
 <div style='text-align: center; color: #888;'>
 🤖 Powered by Cohere AI + Notion API | Your intelligent goal management system
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+st.session_state.last_rerun = metrics.end_rerun(rerun_scope)
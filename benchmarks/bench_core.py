@@ -0,0 +1,340 @@
+"""Benchmarks for the scheduler core and the Notion read path
+
+Synthetic workloads for find_free_slots (10 to 10,000 tasks), multi-day
+ranges, energy lookups with many periods, fitting the learned energy
+model on task history, Notion page parsing, one page
+of the task table from the mirror, overlap checks against the interval
+index, prompt building in
+suggest_optimal_slot, time to the first streamed recommendation,
+paginated reads from a local fake Notion server with latency and 429
+injection, and the batch planner's throughput as the process pool grows.
+Results are written as JSON so runs from different commits can be
+compared.
+
+    python benchmarks/bench_core.py --output bench.json
+    python benchmarks/bench_core.py --quick --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, time as dtime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from batch_planner import plan_all  # noqa: E402
+from fake_services import FakeCohereClient, FakeNotionServer, make_page  # noqa: E402
+from goal_tracker import NotionAPI, SmartScheduler, UserProfile  # noqa: E402
+from energy_model import EnergyModel  # noqa: E402
+from interval_index import IntervalIndex  # noqa: E402
+from notion_transport import NotionTransport, TokenBucket  # noqa: E402
+from prompt_builder import estimate_tokens  # noqa: E402
+from task_mirror import TaskMirror  # noqa: E402
+from task_record import Task  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def timeit(func, repeat: int) -> list:
+    """Wall-clock seconds for `repeat` calls of func"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def result(name: str, params: dict, timings: list, **extra) -> dict:
+    median = statistics.median(timings)
+    return {
+        "name": name,
+        "params": params,
+        "repeat": len(timings),
+        "median_s": median,
+        "min_s": min(timings),
+        "max_s": max(timings),
+        "ops_per_s": 1 / median if median else None,
+        **extra
+    }
+
+
+def synthetic_tasks(count: int, days: int = 1, rng: random.Random = None) -> list:
+    rng = rng or random.Random(count)
+    tasks = []
+    for i in range(count):
+        hour = rng.randint(0, 23)
+        minute = rng.choice((0, 15, 30, 45))
+        tasks.append(Task(
+            activity=f"Task {i}",
+            date=(START + timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d"),
+            time=dtime(hour, minute).strftime('%I:%M %p'),
+            duration=rng.choice((15, 30, 45, 60, 90)),
+            energy="Medium",
+            status="📝 Planned"
+        ))
+    return tasks
+
+
+def profile_with_periods(count: int) -> UserProfile:
+    """Profile with `count` alternating high/low energy periods spread over the day"""
+    profile = UserProfile()
+    step = (24 * 60) // (count * 2 + 1)
+    periods = [(dtime(m // 60, m % 60), dtime((m + step // 2) // 60, (m + step // 2) % 60))
+               for m in range(0, 24 * 60 - step, step)][:count * 2]
+    profile.high_energy_periods = periods[0::2] or profile.high_energy_periods
+    profile.low_energy_periods = periods[1::2] or profile.low_energy_periods
+    return profile
+
+
+def bench_find_free_slots(sizes, repeat):
+    scheduler = SmartScheduler(UserProfile())
+    for size in sizes:
+        tasks = synthetic_tasks(size)
+        timings = timeit(lambda: scheduler.find_free_slots(START, tasks, 30), repeat)
+        yield result("find_free_slots", {"tasks": size}, timings)
+
+
+def bench_find_free_slots_range(day_counts, tasks_per_day, repeat):
+    scheduler = SmartScheduler(UserProfile())
+    for days in day_counts:
+        tasks = synthetic_tasks(days * tasks_per_day, days)
+        end = START + timedelta(days=days - 1)
+        timings = timeit(lambda: scheduler.find_free_slots_range(START, end, tasks, 30), repeat)
+        yield result("find_free_slots_range", {"days": days, "tasks": len(tasks)}, timings)
+
+
+def bench_energy_level(period_counts, lookups, repeat):
+    for count in period_counts:
+        scheduler = SmartScheduler(profile_with_periods(count))
+        moments = [dtime(m // 60, m % 60) for m in range(0, 24 * 60, max(1, 24 * 60 // lookups))]
+        timings = timeit(lambda: [scheduler._get_energy_level(moment) for moment in moments], repeat)
+        yield result("_get_energy_level", {"periods": count, "lookups": len(moments)}, timings)
+
+
+def bench_energy_model(sizes, repeat):
+    """Refitting the learned energy model on past tasks, and lookups through its table"""
+    for size in sizes:
+        rng = random.Random(size)
+        tasks = synthetic_tasks(size, days=365, rng=rng)
+        for i, task in enumerate(tasks):
+            task.id = f"page-{i}"
+            task.status = rng.choice(("📝 Planned", "✅ Done"))
+        today = (START + timedelta(days=365)).date()
+        timings = timeit(lambda: EnergyModel().fit(tasks, today), repeat)
+        yield result("energy_model_fit", {"tasks": size}, timings)
+
+    scheduler = SmartScheduler(UserProfile(), energy_model=EnergyModel().fit(tasks, today))
+    moments = [dtime(m // 60, m % 60) for m in range(0, 24 * 60)]
+    timings = timeit(lambda: [scheduler._get_energy_level(moment, 0) for moment in moments], repeat)
+    yield result("_get_energy_level", {"model": True, "lookups": len(moments)}, timings)
+
+
+def bench_parse_pages(sizes, repeat):
+    for size in sizes:
+        pages = [{"id": str(i), "last_edited_time": "2024-01-01T00:00:00.000Z",
+                  "properties": make_page(f"Task {i}", "2024-01-01", "09:00 AM", 30)}
+                 for i in range(size)]
+        timings = timeit(lambda: [NotionAPI._parse_task(page) for page in pages], repeat)
+        yield result("parse_tasks", {"pages": size}, timings)
+
+
+def bench_overlap_checks(sizes, lookups, repeat):
+    """Overlap lookups on one day through the interval index, by tasks on that day"""
+    for size in sizes:
+        index = IntervalIndex()
+        index.load(synthetic_tasks(size))
+        rng = random.Random(size)
+        spans = [(start, start + rng.choice((15, 30, 60))) for start in (rng.randrange(24 * 60) for _ in range(lookups))]
+        day = START.strftime("%Y-%m-%d")
+        timings = timeit(lambda: [index.overlapping(day, start, end) for start, end in spans], repeat)
+        yield result("interval_overlaps", {"tasks": size, "lookups": lookups}, timings)
+
+
+def bench_task_page(sizes, repeat):
+    """One filtered, sorted page of the task table from the mirror, by database size"""
+    for size in sizes:
+        rng = random.Random(size)
+        mirror = TaskMirror()
+        tasks = synthetic_tasks(size, days=90, rng=rng)
+        for i, task in enumerate(tasks):
+            task.id = f"page-{i}"
+            task.status = rng.choice(("📝 Planned", "✅ Done"))
+            task.category = rng.choice(("Work", "Health", "Personal"))
+        mirror.upsert("db", tasks)
+        timings = timeit(lambda: mirror.query_page("db", status="✅ Done", descending=True, limit=50, offset=100),
+                         repeat)
+        yield result("task_table_page", {"tasks": size}, timings)
+
+
+def bench_suggest(slot_counts, repeat):
+    """suggest_optimal_slot with the LLM path forced, against a zero-latency stub"""
+    client = FakeCohereClient()
+    scheduler = SmartScheduler(UserProfile(), tie_threshold=100, llm_client=client)
+    for count in slot_counts:
+        slots = [{'start': START + timedelta(minutes=40 * i), 'end': START + timedelta(minutes=40 * i + 30),
+                  'duration': 30, 'energy': "Medium", 'energy_score': 0.5} for i in range(count)]
+        client.calls.clear()
+        timings = timeit(lambda: scheduler.suggest_optimal_slot("Study", 30, slots, "medium"), repeat)
+        prompt_chars = len(client.calls[-1]) if client.calls else 0
+        yield result("suggest_optimal_slot", {"slots": count}, timings, prompt_chars=prompt_chars,
+                     prompt_tokens=estimate_tokens(client.calls[-1]) if client.calls else 0)
+
+
+def bench_suggest_stream(token_latency, repeat):
+    """Time to the first streamed recommendation versus the whole reply"""
+    reply = "SLOT: 2\nREASON: " + " ".join(["Quiet evening hours suit focused study"] * 6)
+    client = FakeCohereClient(reply, latency=token_latency * 5, token_latency=token_latency)
+    scheduler = SmartScheduler(UserProfile(), tie_threshold=100, llm_client=client)
+    slots = [{'start': START + timedelta(hours=h), 'end': START + timedelta(hours=h + 1),
+              'duration': 60, 'energy': "Medium"} for h in (7, 12, 18, 20)]
+
+    first, total = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stream = scheduler.suggest_optimal_slot_stream("Study", 60, slots)
+        next(stream)
+        first.append(time.perf_counter() - started)
+        for _ in stream:
+            pass
+        total.append(time.perf_counter() - started)
+    params = {"token_latency_s": token_latency}
+    yield result("suggest_stream_first", params, first)
+    yield result("suggest_stream_total", params, total)
+
+
+def bench_notion_reads(sizes, latency, throttle_every, repeat):
+    """Full paginated get_tasks against the fake server, cache off"""
+    for size in sizes:
+        with FakeNotionServer(latency=latency, throttle_every=throttle_every, retry_after=0) as server:
+            for i in range(size):
+                server.add_page(make_page(f"Task {i}", "2024-01-01", "09:00 AM", 30))
+            transport = NotionTransport(server.token, base_url=server.url, backoff_base=0.001,
+                                        limiter=TokenBucket(rate=1000, capacity=1000))
+            api = NotionAPI(server.token, server.database_id, transport=transport)
+
+            def read():
+                success, tasks = api.get_tasks(use_cache=False)
+                assert success and len(tasks) == size, tasks
+
+            server.request_log.clear()
+            timings = timeit(read, repeat)
+            transport.close()
+            yield result("notion_get_tasks", {"pages": size, "latency_s": latency, "throttle_every": throttle_every},
+                         timings, requests=len(server.request_log) / repeat)
+
+
+def bench_batch_planner(record_count, worker_counts, repeat):
+    """Profiles per second for the headless planner as the process pool grows"""
+    rng = random.Random(record_count)
+    records = [
+        {
+            "id": i,
+            "goals": [
+                {"activity": f"Goal {j}", "duration": rng.choice((30, 45, 60, 90)),
+                 "priority": rng.choice(("High", "Medium", "Low")), "category": "Personal"}
+                for j in range(8)
+            ],
+            "existing_tasks": [task.to_dict() for task in synthetic_tasks(28, days=7, rng=rng)],
+            "start_date": START.strftime("%Y-%m-%d"),
+            "end_date": (START + timedelta(days=6)).strftime("%Y-%m-%d")
+        }
+        for i in range(record_count)
+    ]
+    start = records[0]["start_date"]
+    for workers in worker_counts:
+        if workers <= 1:
+            timings = timeit(lambda: list(plan_all(records, start, 7, workers)), repeat)
+            yield result("batch_planner", {"profiles": record_count, "workers": workers}, timings,
+                         profiles_per_s=record_count / statistics.median(timings), startup_s=0.0)
+            continue
+
+        # Pool start-up is paid once per run, so it is reported apart from planning throughput
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(abs, range(workers)))
+            startup = time.perf_counter() - started
+            timings = timeit(lambda: list(plan_all(records, start, 7, workers, pool=pool)), repeat)
+        yield result("batch_planner", {"profiles": record_count, "workers": workers}, timings,
+                     profiles_per_s=record_count / statistics.median(timings), startup_s=startup)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: list, baseline_path: str):
+    """Print the median ratio of each benchmark against a previous report"""
+    baseline = {
+        (entry["name"], json.dumps(entry["params"], sort_keys=True)): entry
+        for entry in json.loads(Path(baseline_path).read_text())["results"]
+    }
+    for entry in current:
+        previous = baseline.get((entry["name"], json.dumps(entry["params"], sort_keys=True)))
+        if previous:
+            ratio = entry["median_s"] / previous["median_s"] if previous["median_s"] else float("inf")
+            print(f"{entry['name']:<24} {json.dumps(entry['params']):<60} {ratio:6.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller workloads and fewer repeats")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON report to compare medians against")
+    parser.add_argument("--latency", type=float, default=0.005, help="fake Notion latency per request")
+    parser.add_argument("--throttle-every", type=int, default=5, help="answer every n-th request with 429")
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else 7
+    sizes = [10, 100, 1000] if args.quick else [10, 100, 1000, 10000]
+
+    results = []
+    for bench in (
+        bench_find_free_slots(sizes, repeat),
+        bench_find_free_slots_range([7, 30] if args.quick else [7, 30, 90], 8, repeat),
+        bench_energy_level([1, 10, 100], 1440, repeat),
+        bench_energy_model(sizes + [100000], repeat),
+        bench_parse_pages(sizes, repeat),
+        bench_task_page(sizes, repeat),
+        bench_overlap_checks(sizes, 1000, repeat),
+        bench_suggest([5, 50, 500], repeat),
+        bench_suggest_stream(0.01, repeat),
+        bench_notion_reads([100, 1000] if args.quick else [100, 1000, 5000],
+                           args.latency, args.throttle_every, 1 if args.quick else 3),
+        bench_batch_planner(100 if args.quick else 500, sorted({1, 2, os.cpu_count() or 1}), 1 if args.quick else 3),
+    ):
+        for entry in bench:
+            print(f"{entry['name']:<24} {json.dumps(entry['params']):<60} {entry['median_s'] * 1000:10.3f} ms",
+                  file=sys.stderr)
+            results.append(entry)
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "results": results
+    }
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(encoded)
+    else:
+        print(encoded)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Cold-start import report for the scheduler core
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+summarizes the median cumulative cost and the heaviest imports. Exits with
+status 1 if the module pulls in a UI/LLM package or exceeds --budget-ms.
+
+    python benchmarks/importtime_report.py --runs 5 --json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Packages the core must not import eagerly
+FORBIDDEN = ("streamlit", "cohere")
+
+
+def measure(module: str) -> dict:
+    """Import `module` in a fresh interpreter and parse the -X importtime log
+
+    Returns {name: (self_us, cumulative_us, depth)} for imports made after
+    interpreter startup (everything logged after `site`).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    imports = {}
+    started = False
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        name = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if not started:
+            started = depth == 0 and name == "site"
+            continue
+        imports[name] = (int(self_us), int(cumulative_us), depth)
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="goal_tracker")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if the median import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals_ms = [run[args.module][1] / 1000 for run in runs]
+
+    # Median cumulative time of each direct import of the module across runs
+    children = {}
+    for run in runs:
+        for name, (_, cumulative_us, depth) in run.items():
+            if depth == 1:
+                children.setdefault(name, []).append(cumulative_us / 1000)
+    heaviest = sorted(
+        ((name, statistics.median(values)) for name, values in children.items()),
+        key=lambda item: -item[1]
+    )[:args.top]
+    forbidden = sorted({name.split(".")[0] for run in runs for name in run} & set(FORBIDDEN))
+
+    report = {
+        "module": args.module,
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "median_ms": round(statistics.median(totals_ms), 2),
+        "min_ms": round(min(totals_ms), 2),
+        "max_ms": round(max(totals_ms), 2),
+        "heaviest": [{"name": name, "cumulative_ms": round(ms, 2)} for name, ms in heaviest],
+        "forbidden_imports": forbidden
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {args.module}: median {report['median_ms']} ms "
+              f"(min {report['min_ms']}, max {report['max_ms']}, {args.runs} runs)")
+        for entry in report["heaviest"]:
+            print(f"  {entry['cumulative_ms']:>9.2f} ms  {entry['name']}")
+        if forbidden:
+            print(f"  eagerly imports: {', '.join(forbidden)}")
+
+    over_budget = args.budget_ms is not None and report["median_ms"] > args.budget_ms
+    sys.exit(1 if forbidden or over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Energy curve learned from the task history in Notion
+
+EnergyModel counts, for each weekday and time bin (30 minutes by
+default), how many past tasks started there and how many of those were
+finished. Bins where the smoothed completion rate is clearly above the
+overall rate count as high energy, clearly below as low; bins with too
+little history keep the profile's levels. The result is a 7 x 1440 table
+of levels that SmartScheduler indexes directly.
+
+Counts are updated with NumPy scatter-adds, so a full refit over 100k
+tasks takes a fraction of a second, and a mirror sync only adds the pages
+it pulled. A page seen again replaces its earlier contribution.
+"""
+
+import threading
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from task_record import Task
+
+MINUTES_PER_DAY = 24 * 60
+
+# Status names containing one of these count as finished ("✅ Done", "Completed")
+DONE_MARKERS = ("done", "complete")
+
+
+def is_done(status: str) -> bool:
+    status = (status or "").lower()
+    return any(marker in status for marker in DONE_MARKERS)
+
+
+class EnergyModel:
+    """Completion rates by weekday and time of day, as a per-minute energy table"""
+
+    def __init__(self, bin_minutes: int = 30, min_samples: int = 5, margin: float = 0.1,
+                 prior_weight: float = 5.0):
+        if MINUTES_PER_DAY % bin_minutes:
+            raise ValueError("bin_minutes must divide a day evenly")
+        self.bin_minutes = bin_minutes
+        self.bins = MINUTES_PER_DAY // bin_minutes
+        # A bin needs this many past tasks before it overrides the profile
+        self.min_samples = min_samples
+        # How far above or below the overall completion rate makes a bin high or low
+        self.margin = margin
+        # Pseudo-counts at the overall rate, so sparse bins are pulled toward it
+        self.prior_weight = prior_weight
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._total = np.zeros(7 * self.bins, dtype=np.int64)
+            self._done = np.zeros(7 * self.bins, dtype=np.int64)
+            # page id -> (bin, done) of counted tasks, and (day, bin) of future ones not yet finished
+            self._counted: Dict[str, tuple] = {}
+            self._future: Dict[str, tuple] = {}
+            self._version = 0
+            self._cached = None
+
+    @property
+    def samples(self) -> int:
+        """Number of past tasks the model has learned from"""
+        return int(self._total.sum())
+
+    def fit(self, tasks: Iterable[Task], today: Optional[date] = None) -> "EnergyModel":
+        """Forget everything and learn from `tasks`"""
+        self.clear()
+        self.update(tasks, today)
+        return self
+
+    def update(self, tasks: Iterable[Task], today: Optional[date] = None):
+        """Add new or changed tasks, e.g. a batch from a mirror sync
+
+        A task counts once its day is over or it is finished; planned tasks
+        on later days are held back until then, when they count as missed.
+        """
+        today = (today or date.today()).isoformat()
+        ids, days, starts, done = [], [], [], []
+        for task in tasks:
+            if task.id:
+                self._forget(task.id)
+            if task.scheduled and not task.error and task.date:
+                ids.append(task.id)
+                days.append(task.date[:10])
+                starts.append(task.start_minute)
+                done.append(is_done(task.status))
+
+        with self._lock:
+            due = [page_id for page_id, (day, _) in self._future.items() if day < today]
+            for page_id in due:
+                day, bin_index = self._future.pop(page_id)
+                self._counted[page_id] = (bin_index, False)
+                self._total[bin_index] += 1
+
+            if days:
+                # 1970-01-01 was a Thursday, so day number + 3 is the weekday with Monday = 0
+                weekdays = (np.array(days, dtype="datetime64[D]").astype(np.int64) + 3) % 7
+                bin_index = weekdays * self.bins + np.asarray(starts, dtype=np.int64) // self.bin_minutes
+                done = np.asarray(done, dtype=bool)
+                counted = done | (np.asarray(days) < today)
+
+                np.add.at(self._total, bin_index[counted], 1)
+                np.add.at(self._done, bin_index[done], 1)
+                for page_id, day, index, finished, is_counted in zip(ids, days, bin_index.tolist(), done.tolist(),
+                                                                     counted.tolist()):
+                    if not page_id:
+                        continue
+                    if is_counted:
+                        self._counted[page_id] = (index, finished)
+                    else:
+                        self._future[page_id] = (day, index)
+
+            if days or due:
+                self._version += 1
+
+    def remove(self, page_ids: Iterable[str]):
+        """Forget pages that were deleted in Notion"""
+        for page_id in page_ids:
+            self._forget(page_id)
+
+    def table(self, fallback: np.ndarray) -> np.ndarray:
+        """Energy level (0=Low .. 2=High) for each weekday and minute, shape (7, 1440)
+
+        `fallback` is the profile's per-minute levels, used where history is thin.
+        """
+        with self._lock:
+            key = (self._version, fallback.tobytes())
+            if self._cached is not None and self._cached[0] == key:
+                return self._cached[1]
+
+            total = self._total.astype(np.float64)
+            overall = self._done.sum() / total.sum() if total.sum() else 0.5
+            rates = (self._done + self.prior_weight * overall) / (total + self.prior_weight)
+            levels = np.where(rates >= overall + self.margin, 2, np.where(rates <= overall - self.margin, 0, 1))
+            levels = np.where(self._total >= self.min_samples, levels, -1).astype(np.int8)
+
+            by_minute = np.repeat(levels.reshape(7, self.bins), self.bin_minutes, axis=1)
+            table = np.where(by_minute >= 0, by_minute, np.broadcast_to(fallback, (7, MINUTES_PER_DAY)))
+            table = table.astype(np.int8)
+            self._cached = (key, table)
+            return table
+
+    def rates(self) -> np.ndarray:
+        """Raw completion rate per weekday and bin, NaN where there is no history, shape (7, bins)"""
+        with self._lock:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return (self._done / self._total).reshape(7, self.bins)
+
+    def _forget(self, page_id: str):
+        """Drop a page's earlier contribution before it is counted again"""
+        with self._lock:
+            self._future.pop(page_id, None)
+            previous = self._counted.pop(page_id, None)
+            if previous:
+                bin_index, finished = previous
+                self._total[bin_index] -= 1
+                if finished:
+                    self._done[bin_index] -= 1
+                self._version += 1
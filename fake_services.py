@@ -0,0 +1,352 @@
+"""Local stand-ins for api.notion.com and the Cohere client
+
+FakeNotionServer speaks the subset of the Notion REST API the app uses
+(database lookup, paginated queries, page creation) on 127.0.0.1, with
+configurable latency and 429 injection. FakeCohereClient replaces
+cohere.Client with canned replies. Run this file directly for a smoke
+check of the pooled transport against the fake server.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, List
+from urllib.parse import urlparse, parse_qs
+
+
+def make_page(activity: str, date: str, time_str: str = "", duration: int = 30,
+              energy: str = "Medium", status: str = "📝 Planned", category: str = "Personal") -> Dict:
+    """Build page properties in the shape NotionAPI.create_task sends"""
+    return {
+        "Activity": {"title": [{"text": {"content": activity}}]},
+        "Date": {"date": {"start": date}},
+        "Time": {"rich_text": [{"text": {"content": time_str}}]},
+        "Duration": {"number": duration},
+        "Energy": {"select": {"name": energy}},
+        "Status": {"select": {"name": status}},
+        "Category": {"select": {"name": category}}
+    }
+
+
+class FakeNotionServer:
+    """Threaded HTTP server that behaves like a single Notion database"""
+
+    def __init__(self, database_id: str = "fakedb", token: str = "fake-token",
+                 latency: float = 0.0, max_page_size: int = 100,
+                 throttle_every: int = 0, retry_after: float = 0.0):
+        self.database_id = database_id
+        self.token = token
+        self.latency = latency
+        self.max_page_size = max_page_size
+        # Every n-th request is answered with 429 (0 disables injection)
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+
+        self.pages: List[Dict] = []
+        self.request_log: List[tuple] = []
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def add_page(self, properties: Dict) -> Dict:
+        """Insert a page directly, bypassing HTTP"""
+        now = _timestamp()
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "created_time": now,
+            "last_edited_time": now,
+            "archived": False,
+            "parent": {"database_id": self.database_id},
+            "properties": properties
+        }
+        with self._lock:
+            self.pages.append(page)
+        return page
+
+    def edit_page(self, page_id: str, properties: Dict) -> Dict:
+        """Update page properties and bump last_edited_time, as an edit in Notion would"""
+        with self._lock:
+            page = next(page for page in self.pages if page["id"] == page_id)
+            page["properties"].update(properties)
+            page["last_edited_time"] = _timestamp()
+        return page
+
+    def archive_page(self, page_id: str):
+        """Archive a page, as deleting it in Notion does; queries stop returning it"""
+        with self._lock:
+            page = next(page for page in self.pages if page["id"] == page_id)
+            page["archived"] = True
+            page["last_edited_time"] = _timestamp()
+
+    def start(self) -> "FakeNotionServer":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def query(self, body: Dict) -> Dict:
+        """Answer a database query body with one page of results"""
+        with self._lock:
+            pages = [page for page in self.pages
+                     if not page.get("archived") and _matches(page, body.get("filter"))]
+        for sort in reversed(body.get("sorts") or []):
+            pages.sort(key=lambda page: _sort_key(page, sort), reverse=sort.get("direction") == "descending")
+
+        start = int(body.get("start_cursor") or 0)
+        size = min(int(body.get("page_size") or 100), self.max_page_size)
+        end = start + size
+        has_more = end < len(pages)
+        return {
+            "object": "list",
+            "results": pages[start:end],
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None
+        }
+
+    def schema(self) -> Dict:
+        """Database object whose select properties list the option names in use"""
+        options = {}
+        with self._lock:
+            for page in self.pages:
+                for name, prop in page["properties"].items():
+                    if "select" in prop:
+                        choice = (prop.get("select") or {}).get("name")
+                        names = options.setdefault(name, [])
+                        if choice and choice not in names:
+                            names.append(choice)
+        return {
+            "object": "database",
+            "id": self.database_id,
+            "properties": {
+                name: {"type": "select", "select": {"options": [{"name": choice} for choice in names]}}
+                for name, names in options.items()
+            }
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _send(self, status: int, payload: Dict, headers: Dict = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, status: int, code: str, message: str, headers: Dict = None):
+                self._send(status, {"object": "error", "status": status, "code": code, "message": message}, headers)
+
+            def _dispatch(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                parsed = urlparse(self.path)
+
+                with server._lock:
+                    server.request_log.append((method, parsed.path, parse_qs(parsed.query), body))
+                    count = len(server.request_log)
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if server.throttle_every and count % server.throttle_every == 0:
+                    return self._error(429, "rate_limited", "Rate limited",
+                                       {"Retry-After": str(server.retry_after)})
+
+                if self.headers.get("Authorization") != f"Bearer {server.token}":
+                    return self._error(401, "unauthorized", "API token is invalid.")
+
+                db_path = f"/v1/databases/{server.database_id}"
+                if method == "GET" and parsed.path == db_path:
+                    return self._send(200, server.schema())
+                if method == "POST" and parsed.path == f"{db_path}/query":
+                    return self._send(200, server.query(body))
+                if method == "POST" and parsed.path == "/v1/pages":
+                    parent = body.get("parent", {}).get("database_id")
+                    if parent != server.database_id:
+                        return self._error(404, "object_not_found", "Could not find database.")
+                    return self._send(200, server.add_page(body.get("properties", {})))
+                if re.match(r"^/v1/databases/[^/]+", parsed.path):
+                    return self._error(404, "object_not_found", "Could not find database.")
+                return self._error(400, "invalid_request_url", "Invalid request URL.")
+
+        return Handler
+
+
+class FakeCohereClient:
+    """Drop-in for cohere.Client that answers chat() and chat_stream() with a canned reply
+
+    chat_stream sleeps `latency` before the first event and `token_latency`
+    between events, one per whitespace-delimited token of the reply.
+    """
+
+    def __init__(self, reply: str = "SLOT: 1\nREASON: Matches your energy pattern", latency: float = 0.0,
+                 token_latency: float = 0.0):
+        self.reply = reply
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls: List[str] = []
+        self.streamed_tokens = 0
+
+    def chat(self, message: str, model: str = None, **kwargs):
+        self.calls.append(message)
+        if self.latency:
+            time.sleep(self.latency)
+        return SimpleNamespace(text=self.reply)
+
+    def chat_stream(self, message: str, model: str = None, **kwargs):
+        self.calls.append(message)
+        yield SimpleNamespace(event_type="stream-start")
+        if self.latency:
+            time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self.reply):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            self.streamed_tokens += 1
+            yield SimpleNamespace(event_type="text-generation", text=token)
+        yield SimpleNamespace(event_type="stream-end", finish_reason="COMPLETE")
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _matches(page: Dict, condition: Dict) -> bool:
+    """Evaluate the subset of Notion filters the app sends"""
+    if not condition:
+        return True
+    if "and" in condition:
+        return all(_matches(page, c) for c in condition["and"])
+    if "or" in condition:
+        return any(_matches(page, c) for c in condition["or"])
+
+    if "timestamp" in condition:
+        field = condition["timestamp"]
+        return _compare(page.get(field) or "", condition[field], date_only=False)
+
+    if "property" in condition:
+        prop = page["properties"].get(condition["property"], {})
+        if "date" in condition:
+            value = ((prop.get("date") or {}).get("start") or "")[:10]
+            return _compare(value, condition["date"])
+        if "select" in condition:
+            value = (prop.get("select") or {}).get("name")
+            return _compare(value, condition["select"], date_only=False)
+        for kind in ("title", "rich_text"):
+            if kind in condition:
+                value = "".join(part.get("text", {}).get("content", "") for part in prop.get(kind) or [])
+                return _compare(value, condition[kind], date_only=False)
+        return True
+
+    return True
+
+
+def _sort_key(page: Dict, sort: Dict):
+    if "timestamp" in sort:
+        return page.get(sort["timestamp"]) or ""
+    prop = page["properties"].get(sort.get("property"), {})
+    if "date" in prop:
+        return (prop.get("date") or {}).get("start") or ""
+    if "select" in prop:
+        return (prop.get("select") or {}).get("name") or ""
+    if "number" in prop:
+        return prop.get("number") or 0
+    for key in ("title", "rich_text"):
+        if key in prop:
+            return "".join(part.get("text", {}).get("content", "") for part in prop[key])
+    return ""
+
+
+def _compare(value, operators: Dict, date_only: bool = True) -> bool:
+    for op, target in operators.items():
+        if date_only and isinstance(target, str):
+            target = target[:10]
+        if op == "equals" and value != target:
+            return False
+        if op == "does_not_equal" and value == target:
+            return False
+        if op == "on_or_after" and not (value and value >= target):
+            return False
+        if op == "on_or_before" and not (value and value <= target):
+            return False
+        if op == "after" and not (value and value > target):
+            return False
+        if op == "before" and not (value and value < target):
+            return False
+    return True
+
+
+def main():
+    """Smoke-check NotionTransport against the fake server"""
+    from notion_transport import NotionTransport, TokenBucket
+
+    with FakeNotionServer(throttle_every=4, retry_after=0.05) as server:
+        for i in range(250):
+            server.add_page(make_page(f"Task {i}", "2024-01-01", "09:00 AM", 30))
+
+        transport = NotionTransport(server.token, base_url=server.url, backoff_base=0.01,
+                                    limiter=TokenBucket(rate=50, capacity=50))
+        started = time.perf_counter()
+
+        response = transport.get(f"/databases/{server.database_id}")
+        assert response.status_code == 200, response.text
+
+        fetched, body = 0, {"page_size": 100}
+        while True:
+            payload = transport.post(f"/databases/{server.database_id}/query", json=body).json()
+            fetched += len(payload["results"])
+            if not payload["has_more"]:
+                break
+            body["start_cursor"] = payload["next_cursor"]
+        assert fetched == 250, fetched
+
+        response = transport.post("/pages", idempotent=False, json={
+            "parent": {"database_id": server.database_id},
+            "properties": make_page("New task", "2024-01-02")
+        })
+        assert response.status_code == 200, response.text
+        transport.close()
+
+        elapsed = time.perf_counter() - started
+        throttled = sum(1 for i in range(1, len(server.request_log) + 1) if i % server.throttle_every == 0)
+        print(f"OK: {len(server.request_log)} requests ({throttled} throttled and retried) in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1361 @@
+"""Scheduling and Notion core for the Smart Goal Tracker
+
+Everything the Streamlit app needs that has no UI: the Notion client, user
+profile and scheduler. Importing this module has no side effects; the
+Cohere client is only created on the first LLM call, and asyncio and
+requests are only imported by the code paths that use them, so worker
+processes and tests start quickly (see benchmarks/importtime_report.py).
+"""
+
+import contextvars
+import os
+import queue
+import re
+import threading
+import time as time_module
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, time
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Sequence
+
+import numpy as np
+
+from energy_model import EnergyModel
+from interval_index import IntervalIndex
+from llm_cache import LLMCache, fingerprint
+from metrics import metrics
+from notion_transport import NotionTransport
+from prompt_builder import build_slot_prompt
+from task_mirror import TaskMirror
+from task_record import Task, parse_clock, task_content_key
+from write_queue import WriteQueue
+
+COHERE_API_KEY = os.environ.get("COHERE_API_KEY", "")
+COHERE_MODEL = "command-r-08-2024"
+
+ENERGY_LEVELS = ("Low", "Medium", "High")
+
+# SLOT is taken once a non-digit follows it, so "SLOT: 1" is not read as "SLOT: 12" mid-stream
+SLOT_PATTERN = re.compile(r"SLOT:\s*\[?(\d+)(?=\D)")
+FINAL_SLOT_PATTERN = re.compile(r"SLOT:\s*\[?(\d+)")
+REASON_PATTERN = re.compile(r"REASON:[ \t]*([^\n]*)")
+MINUTES_PER_DAY = 24 * 60
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+# Energy level (index into ENERGY_LEVELS) each category is best done at
+CATEGORY_ENERGY = {"Work": 2, "Learning": 2, "Health": 1, "Personal": 1, "Social": 0}
+
+# Shared by every scheduler so an overrunning LLM call never blocks a rerun
+_llm_executor = ThreadPoolExecutor(max_workers=4)
+
+_cohere_client = None
+_cohere_lock = threading.Lock()
+
+
+def get_cohere_client():
+    """The process-wide Cohere client, created (and cohere imported) on first use"""
+    global _cohere_client
+    if _cohere_client is None:
+        with _cohere_lock:
+            if _cohere_client is None:
+                import cohere
+                _cohere_client = cohere.Client(COHERE_API_KEY)
+    return _cohere_client
+
+
+def set_cohere_client(client):
+    """Install a client (or a stand-in such as FakeCohereClient) for LLM calls"""
+    global _cohere_client
+    _cohere_client = client
+
+
+class TaskCache:
+    """TTL cache for task queries, keyed by (database_id, date filter)"""
+    
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, database_id: str, date: Optional[str] = None) -> Optional[List[Dict]]:
+        """Return cached tasks, or None if missing or expired
+        
+        `date` is a YYYY-MM-DD day, a "start..end" range or None for all tasks.
+        """
+        now = time_module.monotonic()
+        with self._lock:
+            entry = self._entries.get((database_id, date))
+            if entry and now - entry[0] < self.ttl:
+                metrics.inc("task_cache_total", result="hit")
+                return entry[1]
+            
+            # A fresh unfiltered listing already holds every date
+            if date is not None:
+                full = self._entries.get((database_id, None))
+                if full and now - full[0] < self.ttl:
+                    metrics.inc("task_cache_total", result="hit")
+                    return [task for task in full[1] if self._covers(date, (task.get('date') or '')[:10])]
+        metrics.inc("task_cache_total", result="miss")
+        return None
+    
+    def set(self, database_id: str, date: Optional[str], tasks: List[Dict]):
+        """Store tasks for a query"""
+        with self._lock:
+            self._entries[(database_id, date)] = (time_module.monotonic(), tasks)
+    
+    def invalidate(self, database_id: str, dates: List[str] = ()):
+        """Drop keys covering the given dates plus the unfiltered listing for a database"""
+        dates = list(dates)
+        with self._lock:
+            for key in list(self._entries):
+                db, filter_key = key
+                if db == database_id and (filter_key is None or any(self._covers(filter_key, d) for d in dates)):
+                    del self._entries[key]
+    
+    def discard(self, database_id: str, date: Optional[str] = None):
+        """Drop the entry for exactly this query"""
+        with self._lock:
+            self._entries.pop((database_id, date), None)
+    
+    @staticmethod
+    def _covers(filter_key: str, date: str) -> bool:
+        """Whether a day or "start..end" key includes `date`"""
+        if '..' in filter_key:
+            start, end = filter_key.split('..', 1)
+            return start <= date <= end
+        return filter_key == date
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one page creation in NotionAPI.create_tasks"""
+    index: int
+    success: bool
+    page_id: Optional[str] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    # The page already existed, so nothing was posted
+    duplicate: bool = False
+
+
+class NotionAPIError(Exception):
+    """Raised when Notion answers a request with an error status"""
+    
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NotionAPI:
+    """Notion API Integration"""
+    
+    # Properties requested from database queries (filter_properties)
+    TASK_PROPERTIES = ["Activity", "Date", "Time", "Duration", "Energy", "Status", "Category"]
+    
+    # Task fields query_page can sort by, and the Notion property behind each
+    SORT_PROPERTIES = {"date": "Date", "activity": "Activity", "duration": "Duration",
+                       "energy": "Energy", "status": "Status", "category": "Category"}
+    
+    def __init__(self, api_key: str, database_id: str, cache: Optional[TaskCache] = None,
+                 transport: Optional[NotionTransport] = None, mirror: Optional[TaskMirror] = None,
+                 sync_interval: float = 30.0, write_queue: Optional[WriteQueue] = None,
+                 index: Optional[IntervalIndex] = None, energy_model: Optional[EnergyModel] = None,
+                 reconcile_interval: float = 600.0):
+        self.api_key = api_key
+        self.database_id = database_id.strip().replace('-', '')
+        self.cache = cache
+        self.transport = transport or NotionTransport(api_key)
+        # With a mirror, reads come from SQLite and Notion is only asked for changes
+        self.mirror = mirror
+        self.sync_interval = sync_interval
+        self._last_sync = 0.0
+        self._sync_lock = threading.Lock()
+        # Seconds between whole-database checks for pages deleted in Notion (reconcile_if_due)
+        self.reconcile_interval = reconcile_interval
+        self._last_reconcile = 0.0
+        self._schema = None
+        # With a write queue, create_task stores the task locally and a QueueFlusher sends it
+        self.write_queue = write_queue
+        # Tasks by day, checked before every create for overlaps and duplicates
+        self.index = index if index is not None else IntervalIndex()
+        # Learns from every page a mirror sync pulls in
+        self.energy_model = energy_model
+    
+    @metrics.timed("notion_api_seconds", method="test_connection")
+    def test_connection(self) -> tuple:
+        """Test if connection to database works"""
+        try:
+            response = self.transport.get(f"/databases/{self.database_id}")
+            
+            if response.status_code == 200:
+                return True, "Connection successful!"
+            elif response.status_code == 401:
+                return False, "Invalid API token. Check your integration token."
+            elif response.status_code == 404:
+                return False, "Database not found. Check your Database ID or make sure you shared the database with the integration."
+            else:
+                error_data = response.json()
+                return False, f"Error {response.status_code}: {error_data.get('message', 'Unknown error')}"
+        
+        except Exception as e:
+            return False, f"Connection error: {str(e)}"
+    
+    @metrics.timed("notion_api_seconds", method="create_task")
+    def create_task(self, activity: str, date: str, time_str: str, duration: int, 
+                    energy: str, category: str = "Personal") -> tuple:
+        """Create a new task in Notion database
+        
+        The task is checked against the interval index first: one that is
+        already there is not posted again, and one overlapping another task
+        is refused. With a write queue the task is only queued and this
+        returns at once.
+        """
+        task = {'activity': activity, 'date': date, 'time_str': time_str, 'duration': duration,
+                'energy': energy, 'category': category}
+        
+        if self.write_queue is not None:
+            # The span is held until the flusher posts it; only the days already
+            # indexed are checked, so queuing never waits on Notion
+            blocking = self.hold_task(task)
+            if blocking and blocking.key == self._task_key(task)[0]:
+                if blocking.page_id is None:
+                    return True, "Task is already saved — it will appear in Notion in a moment."
+                return True, "Task is already in Notion."
+            if blocking:
+                return False, f"Overlaps '{blocking.activity}' — pick another time."
+            self.write_queue.enqueue(self.database_id, task)
+            return True, "Task saved — it will appear in Notion in a moment."
+        
+        self._ensure_days([date])
+        result = self._create(0, task)
+        
+        if result.success:
+            if result.duplicate:
+                return True, "Task is already in Notion."
+            self._invalidate([date])
+            return True, "Task successfully added to Notion!"
+        if result.status_code == 409:
+            return False, result.error
+        if result.status_code is None:
+            return False, f"Request error: {result.error}"
+        return False, f"Error {result.status_code}: {result.error}"
+    
+    @metrics.timed("notion_api_seconds", method="create_tasks")
+    def create_tasks(self, tasks: List[Dict], max_workers: int = 4) -> List[TaskResult]:
+        """Create many tasks concurrently, returning one TaskResult per input
+        
+        Each item takes the keyword arguments of create_task. Requests go out
+        through a bounded worker pool and still pass through the transport's
+        rate limiter, so throughput tops out at Notion's request rate. Tasks
+        already in the index come back as duplicates without a request, and
+        ones overlapping another task fail with status 409.
+        """
+        if not tasks:
+            return []
+        
+        self._ensure_days({task.get('date') for task in tasks if task.get('date')})
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as pool:
+            # Workers run in copies of the caller's context, so their requests count toward its rerun
+            futures = [pool.submit(contextvars.copy_context().run, self._create, i, task)
+                       for i, task in enumerate(tasks)]
+            results = [future.result() for future in futures]
+        
+        dates = {task.get('date') for task, result in zip(tasks, results) if result.success and not result.duplicate}
+        if dates:
+            self._invalidate(dates)
+        return results
+    
+    def _create(self, index: int, task: Dict) -> TaskResult:
+        """Reserve the task's span in the index, then post it unless it is in the way of something"""
+        try:
+            page = self._build_page(**task)
+            key, start = self._task_key(task)
+        except (KeyError, TypeError, ValueError) as e:
+            return TaskResult(index, False, error=f"Invalid task: {e}")
+        
+        if start is not None:
+            end = start + int(task['duration'])
+            blocking = self.index.reserve(task['date'], start, end, key, task['activity'])
+            if blocking and blocking.key == key:
+                metrics.inc("notion_creates_skipped_total", reason="duplicate")
+                return TaskResult(index, True, page_id=blocking.page_id or None, status_code=200, duplicate=True)
+            if blocking:
+                metrics.inc("notion_creates_skipped_total", reason="overlap")
+                return TaskResult(index, False, status_code=409, error=(
+                    f"Overlaps '{blocking.activity}' ({blocking.start // 60:02d}:{blocking.start % 60:02d}–"
+                    f"{blocking.end // 60:02d}:{blocking.end % 60:02d})"))
+        
+        result = self._post_page(page)
+        result.index = index
+        if start is not None:
+            if result.success:
+                self.index.confirm(key, result.page_id)
+            else:
+                self.index.release(key)
+        return result
+    
+    def hold_task(self, task: Dict):
+        """Hold a queued task's span in the index, or return the entry in the way"""
+        key, start = self._task_key(task)
+        if start is None:
+            return self.index.find(key)
+        return self.index.reserve(task['date'], start, start + int(task['duration']), key, task['activity'],
+                                  hold=True)
+    
+    @staticmethod
+    def _task_key(task: Dict) -> tuple:
+        """content_key of create_task arguments, with the start minute (None if the time is unreadable)"""
+        return task_content_key(task), parse_clock(task['time_str'])
+    
+    def _ensure_days(self, dates):
+        """Load the index for days it has not seen, so overlaps on them are caught"""
+        for date in sorted(dates):
+            if not self.index.has_day(date):
+                self.get_tasks(date)
+    
+    def _build_page(self, activity: str, date: str, time_str: str, duration: int,
+                    energy: str, category: str = "Personal") -> Dict:
+        """Page creation payload for a task"""
+        return {
+            "parent": {"database_id": self.database_id},
+            "properties": {
+                "Activity": {
+                    "title": [
+                        {
+                            "text": {
+                                "content": activity
+                            }
+                        }
+                    ]
+                },
+                "Date": {
+                    "date": {
+                        "start": date
+                    }
+                },
+                "Time": {
+                    "rich_text": [
+                        {
+                            "text": {
+                                "content": time_str
+                            }
+                        }
+                    ]
+                },
+                "Duration": {
+                    "number": duration
+                },
+                "Energy": {
+                    "select": {
+                        "name": energy
+                    }
+                },
+                "Status": {
+                    "select": {
+                        "name": "📝 Planned"
+                    }
+                },
+                "Category": {
+                    "select": {
+                        "name": category
+                    }
+                }
+            }
+        }
+    
+    def _post_page(self, data: Dict) -> TaskResult:
+        """POST a page payload and summarize the outcome"""
+        try:
+            response = self.transport.post("/pages", idempotent=False, json=data)
+        except Exception as e:
+            return TaskResult(0, False, error=str(e))
+        
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        
+        if response.status_code == 200:
+            return TaskResult(0, True, page_id=payload.get('id'), status_code=200)
+        return TaskResult(0, False, error=payload.get('message', 'Unknown error'),
+                          status_code=response.status_code)
+    
+    @metrics.timed("notion_api_seconds", method="get_tasks")
+    def get_tasks(self, date: str = None, use_cache: bool = True) -> tuple:
+        """Get tasks from Notion database"""
+        
+        try:
+            tasks = list(self.iter_tasks(date, use_cache=use_cache))
+        except NotionAPIError as e:
+            return False, f"Error fetching tasks: {e}"
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+        self.index.load(tasks, [date] if date else None)
+        return True, tasks
+    
+    def iter_tasks(self, date: str = None, page_size: int = 100, use_cache: bool = True):
+        """Yield parsed tasks page by page, following Notion's pagination cursors
+        
+        Only TASK_PROPERTIES are requested. With use_cache=False nothing is
+        retained between pages, so memory stays flat for very large databases;
+        with a mirror, a dated read also drops that day's pages deleted in Notion.
+        """
+        body = {}
+        if date:
+            body["filter"] = {
+                "property": "Date",
+                "date": {
+                    "equals": date
+                }
+            }
+        
+        read_mirror = lambda: self.mirror.get_tasks(self.database_id, date)
+        yield from self._iter_query(date, body, page_size, use_cache, read_mirror)
+    
+    @metrics.timed("notion_api_seconds", method="get_tasks_range")
+    def get_tasks_range(self, start_date: str, end_date: str, use_cache: bool = True) -> tuple:
+        """Get tasks dated between start_date and end_date (inclusive) with one query"""
+        
+        body = {
+            "filter": {
+                "and": [
+                    {"property": "Date", "date": {"on_or_after": start_date}},
+                    {"property": "Date", "date": {"on_or_before": end_date}}
+                ]
+            }
+        }
+        read_mirror = lambda: self.mirror.get_tasks_range(self.database_id, start_date, end_date)
+        
+        try:
+            tasks = list(self._iter_query(f"{start_date}..{end_date}", body, 100, use_cache, read_mirror))
+        except NotionAPIError as e:
+            return False, f"Error fetching tasks: {e}"
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+        first, last = datetime.fromisoformat(start_date[:10]), datetime.fromisoformat(end_date[:10])
+        self.index.load(tasks, [(first + timedelta(days=i)).strftime("%Y-%m-%d")
+                                for i in range((last - first).days + 1)])
+        return True, tasks
+    
+    @metrics.timed("notion_api_seconds", method="query_page")
+    def query_page(self, status: Optional[str] = None, category: Optional[str] = None, sort: str = "date",
+                   descending: bool = False, page_size: int = 50, cursor: Optional[str] = None,
+                   use_cache: bool = True) -> Dict:
+        """One page of tasks, filtered and sorted by the store rather than in Python
+        
+        With a mirror this is an indexed SQLite query and the total is known;
+        otherwise Notion applies the filter and sorts, and the total is None.
+        Pass next_cursor back as cursor for the following page. Returns
+        {"tasks": [...], "next_cursor": str or None, "total": int or None}.
+        """
+        if sort not in self.SORT_PROPERTIES:
+            raise ValueError(f"Cannot sort by {sort!r}")
+        
+        if self.mirror:
+            self.sync_mirror(force=not use_cache)
+            offset = int(cursor or 0)
+            tasks, total = self.mirror.query_page(self.database_id, status, category, sort, descending,
+                                                  page_size, offset)
+            end = offset + len(tasks)
+            return {"tasks": tasks, "next_cursor": str(end) if end < total else None, "total": total}
+        
+        body = {
+            "sorts": [{"property": self.SORT_PROPERTIES[sort], "direction": "descending" if descending else "ascending"}],
+            "page_size": min(max(page_size, 1), 100)
+        }
+        conditions = [
+            {"property": name, "select": {"equals": value}}
+            for name, value in (("Status", status), ("Category", category)) if value
+        ]
+        if conditions:
+            body["filter"] = conditions[0] if len(conditions) == 1 else {"and": conditions}
+        if cursor:
+            body["start_cursor"] = cursor
+        
+        payload = self._query(body)
+        return {
+            "tasks": [self._parse_task(page) for page in payload.get('results', [])],
+            "next_cursor": payload.get('next_cursor') if payload.get('has_more') else None,
+            "total": None
+        }
+    
+    def find_page(self, activity: str, date: str, time_str: str) -> Optional[str]:
+        """Id of an existing page with this activity, date and time, if there is one"""
+        payload = self._query({
+            "filter": {
+                "and": [
+                    {"property": "Activity", "title": {"equals": activity}},
+                    {"property": "Date", "date": {"equals": date}},
+                    {"property": "Time", "rich_text": {"equals": time_str}}
+                ]
+            },
+            "page_size": 1
+        })
+        results = payload.get('results', [])
+        return results[0].get('id') if results else None
+    
+    def select_options(self, prop: str) -> List[str]:
+        """Values of a select property (Status, Category), for filter pickers
+        
+        Read from the mirror when there is one, otherwise from the database
+        schema, which is fetched once per client.
+        """
+        if self.mirror:
+            self.sync_mirror()
+            return self.mirror.distinct(self.database_id, prop.lower())
+        
+        if self._schema is None:
+            response = self.transport.get(f"/databases/{self.database_id}")
+            if response.status_code != 200:
+                return []
+            self._schema = response.json().get('properties', {})
+        options = (self._schema.get(prop) or {}).get('select', {}).get('options', [])
+        return [option['name'] for option in options]
+    
+    def _iter_query(self, cache_key: Optional[str], body: Dict, page_size: int,
+                    use_cache: bool, read_mirror):
+        """Serve a task query from the mirror, the cache or Notion, in that order
+        
+        An uncached, filtered read from the mirror also checks the mirrored
+        tasks it returns against the ids Notion lists for the same filter,
+        so a refreshed day never shows pages deleted there.
+        """
+        if self.mirror:
+            self.sync_mirror(force=not use_cache)
+            if use_cache or not body.get("filter"):
+                yield from read_mirror()
+                return
+            with self._sync_lock:
+                # Read before listing, so pages synced meanwhile can't be mistaken for deleted ones
+                tasks = read_mirror()
+                live = {page.get('id') for page in self._iter_pages(body, properties=["title"])}
+                stale = {task.id for task in tasks} - live
+                if stale:
+                    self._drop_pages(stale)
+            yield from (task for task in tasks if task.id not in stale)
+            return
+        
+        if use_cache and self.cache:
+            cached = self.cache.get(self.database_id, cache_key)
+            if cached is not None:
+                yield from cached
+                return
+        
+        collected = None
+        if self.cache:
+            if use_cache:
+                collected = []
+            else:
+                # Streamed without keeping the pages, so the entry this read replaces is stale
+                self.cache.discard(self.database_id, cache_key)
+        for page in self._iter_pages(body, page_size):
+            task = self._parse_task(page)
+            if collected is not None:
+                collected.append(task)
+            yield task
+        
+        if collected is not None:
+            self.cache.set(self.database_id, cache_key, collected)
+    
+    @metrics.timed("notion_api_seconds", method="sync_mirror")
+    def sync_mirror(self, force: bool = False, full: bool = False) -> int:
+        """Pull pages edited since the mirror's watermark into the mirror
+        
+        Runs at most once per sync_interval unless forced. Notion rounds
+        last_edited_time to the minute, so the watermark is matched with
+        on_or_after and the overlap is absorbed by the upsert. Pages deleted
+        in Notion are not seen by an incremental sync; refreshed dated reads
+        drop them for their days, and reconcile_if_due for the whole
+        database. full=True rebuilds the mirror from scratch. Returns the
+        number of pages written.
+        """
+        with self._sync_lock:
+            now = time_module.monotonic()
+            if not (force or full) and now - self._last_sync < self.sync_interval:
+                return 0
+            
+            if full:
+                self.mirror.clear(self.database_id)
+                if self.energy_model:
+                    self.energy_model.clear()
+            watermark = self.mirror.watermark(self.database_id)
+            
+            body = {"sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]}
+            if watermark:
+                body["filter"] = {
+                    "timestamp": "last_edited_time",
+                    "last_edited_time": {
+                        "on_or_after": watermark
+                    }
+                }
+            
+            written = 0
+            batch = []
+            for page in self._iter_pages(body):
+                task = self._parse_task(page)
+                self.index.upsert(task)
+                batch.append(task)
+                if len(batch) >= 100:
+                    written += self.mirror.upsert(self.database_id, batch)
+                    if self.energy_model:
+                        self.energy_model.update(batch)
+                    watermark = batch[-1]['last_edited_time'] or watermark
+                    batch = []
+            if batch:
+                written += self.mirror.upsert(self.database_id, batch)
+                if self.energy_model:
+                    self.energy_model.update(batch)
+                watermark = batch[-1]['last_edited_time'] or watermark
+            
+            self.mirror.set_watermark(self.database_id, watermark)
+            self._last_sync = now
+            return written
+    
+    @metrics.timed("notion_api_seconds", method="reconcile_mirror")
+    def reconcile_mirror(self) -> int:
+        """Drop mirrored pages Notion no longer returns (deleted or archived), returning how many
+        
+        Lists every page id in the database, a request per hundred pages,
+        so it belongs on a background thread (see reconcile_if_due).
+        """
+        with self._sync_lock:
+            # Ids known before listing, so pages synced meanwhile can't be mistaken for deleted ones
+            known = self.mirror.page_ids(self.database_id)
+            live = {page.get('id') for page in self._iter_pages({}, properties=["title"])}
+            stale = known - live
+            if stale:
+                self._drop_pages(stale)
+            return len(stale)
+    
+    def reconcile_if_due(self) -> int:
+        """reconcile_mirror, at most once per reconcile_interval; QueueFlusher calls it between batches"""
+        now = time_module.monotonic()
+        if not self.mirror or not self.reconcile_interval or now - self._last_reconcile < self.reconcile_interval:
+            return 0
+        self._last_reconcile = now
+        return self.reconcile_mirror()
+    
+    def _drop_pages(self, stale):
+        """Forget pages deleted in Notion everywhere they are kept locally"""
+        dates = self.mirror.delete(self.database_id, stale)
+        self.index.remove_pages(stale)
+        if self.energy_model:
+            self.energy_model.remove(stale)
+        if self.cache:
+            self.cache.invalidate(self.database_id, dates)
+        metrics.inc("mirror_reconciled_pages_total", len(stale))
+    
+    def _invalidate(self, dates):
+        """Drop cached reads for dates that just changed"""
+        if self.cache:
+            self.cache.invalidate(self.database_id, dates)
+        if self.mirror:
+            # The next read pulls the new pages in with an incremental sync
+            self._last_sync = 0.0
+    
+    def _iter_pages(self, body: Dict, page_size: int = 100, properties: Optional[List[str]] = None):
+        """Yield raw page objects from a database query, one response at a time"""
+        body = dict(body, page_size=min(max(page_size, 1), 100))
+        
+        while True:
+            payload = self._query(body, properties)
+            yield from payload.get('results', [])
+            
+            if not payload.get('has_more') or not payload.get('next_cursor'):
+                break
+            body["start_cursor"] = payload['next_cursor']
+    
+    def _query(self, body: Dict, properties: Optional[List[str]] = None) -> Dict:
+        """One database query request, asking only for `properties` (default TASK_PROPERTIES)"""
+        response = self.transport.post(f"/databases/{self.database_id}/query",
+                                       params={"filter_properties": properties or self.TASK_PROPERTIES},
+                                       json=body)
+        if response.status_code != 200:
+            error_data = response.json()
+            raise NotionAPIError(error_data.get('message', 'Unknown error'), response.status_code)
+        return response.json()
+    
+    @staticmethod
+    def _parse_task(result: Dict) -> Task:
+        """Parse a Notion page into a Task"""
+        return Task.from_page(result)
+
+
+class AsyncNotionAPI:
+    """asyncio facade over NotionAPI
+    
+    Each call runs the blocking client on a worker thread (asyncio.to_thread,
+    which carries the caller's metrics scope along), so independent requests
+    can be awaited together. The wrapped client's transport, rate limiter,
+    cache, mirror and index are shared.
+    """
+    
+    def __init__(self, api: NotionAPI):
+        self.api = api
+    
+    async def _run(self, func, *args, **kwargs):
+        import asyncio
+        return await asyncio.to_thread(func, *args, **kwargs)
+    
+    async def test_connection(self) -> tuple:
+        return await self._run(self.api.test_connection)
+    
+    async def create_task(self, activity: str, date: str, time_str: str, duration: int,
+                          energy: str, category: str = "Personal") -> tuple:
+        return await self._run(self.api.create_task, activity, date, time_str, duration, energy, category)
+    
+    async def create_tasks(self, tasks: List[Dict], max_workers: int = 4) -> List[TaskResult]:
+        return await self._run(self.api.create_tasks, tasks, max_workers)
+    
+    async def get_tasks(self, date: str = None, use_cache: bool = True) -> tuple:
+        return await self._run(self.api.get_tasks, date, use_cache)
+    
+    async def get_tasks_range(self, start_date: str, end_date: str, use_cache: bool = True) -> tuple:
+        return await self._run(self.api.get_tasks_range, start_date, end_date, use_cache)
+    
+    async def select_options(self, prop: str) -> List[str]:
+        return await self._run(self.api.select_options, prop)
+    
+    async def sync_mirror(self, force: bool = False, full: bool = False) -> int:
+        return await self._run(self.api.sync_mirror, force, full)
+    
+    async def prefetch(self, dates: List[Optional[str]]) -> List[tuple]:
+        """Fetch several task queries concurrently, warming the cache for each"""
+        import asyncio
+        return await asyncio.gather(*(self.get_tasks(date) for date in dates))
+
+
+class UserProfile:
+    """Store user's daily routine"""
+    def __init__(self):
+        self.sleep_time = time(23, 0)
+        self.wake_time = time(7, 0)
+        self.work_start = time(9, 0)
+        self.work_end = time(17, 0)
+        self.commute_to_work = 30
+        self.commute_from_work = 30
+        self.high_energy_periods = [(time(9, 0), time(11, 30))]
+        self.low_energy_periods = [(time(14, 0), time(15, 30))]
+    
+    TIME_FIELDS = ("sleep_time", "wake_time", "work_start", "work_end")
+    PERIOD_FIELDS = ("high_energy_periods", "low_energy_periods")
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "UserProfile":
+        """Profile from JSON-style data: times as 'HH:MM', periods as [start, end] pairs
+        
+        Missing keys keep their defaults.
+        """
+        profile = cls()
+        for key in cls.TIME_FIELDS:
+            if key in data:
+                setattr(profile, key, time.fromisoformat(data[key]))
+        for key in ("commute_to_work", "commute_from_work"):
+            if key in data:
+                setattr(profile, key, int(data[key]))
+        for key in cls.PERIOD_FIELDS:
+            if key in data:
+                setattr(profile, key, [(time.fromisoformat(start), time.fromisoformat(end))
+                                       for start, end in data[key]])
+        return profile
+    
+    def to_dict(self) -> Dict:
+        data = {key: getattr(self, key).strftime('%H:%M') for key in self.TIME_FIELDS}
+        data["commute_to_work"] = self.commute_to_work
+        data["commute_from_work"] = self.commute_from_work
+        for key in self.PERIOD_FIELDS:
+            data[key] = [[start.strftime('%H:%M'), end.strftime('%H:%M')] for start, end in getattr(self, key)]
+        return data
+
+
+class AvailabilityEngine:
+    """Minute-resolution busy mask and energy vector over consecutive days
+    
+    Minute 0 is midnight of start_day. One extra day is kept at the end so
+    sleep times and tasks after midnight of the last day still fit.
+    energy_by_minute is one day of levels, or one row per weekday (7 x 1440).
+    """
+    
+    def __init__(self, start_day, n_days: int, energy_by_minute: np.ndarray):
+        self.origin = datetime.combine(start_day, time(0))
+        self.size = (n_days + 1) * MINUTES_PER_DAY
+        if energy_by_minute.ndim == 2:
+            weekdays = (start_day.weekday() + np.arange(n_days + 1)) % 7
+            self.energy = energy_by_minute[weekdays].ravel()
+        else:
+            self.energy = np.tile(energy_by_minute, n_days + 1)
+        self._energy_cumsum = np.concatenate(([0], np.cumsum(self.energy, dtype=np.int64)))
+        self._diff = np.zeros(self.size + 1, dtype=np.int32)
+        self._busy = None
+    
+    def to_minute(self, moment: datetime) -> int:
+        return int((moment - self.origin).total_seconds() // 60)
+    
+    def add_busy(self, starts: Sequence[int], ends: Sequence[int]):
+        """Mark [start, end) minute intervals as busy"""
+        starts = np.clip(np.asarray(starts, dtype=np.int64), 0, self.size)
+        ends = np.clip(np.asarray(ends, dtype=np.int64), 0, self.size)
+        keep = ends > starts
+        np.add.at(self._diff, starts[keep], 1)
+        np.add.at(self._diff, ends[keep], -1)
+        self._busy = None
+    
+    @property
+    def busy(self) -> np.ndarray:
+        if self._busy is None:
+            self._busy = np.cumsum(self._diff[:-1]) > 0
+        return self._busy
+    
+    def free_runs(self, window_start: int, window_end: int) -> tuple:
+        """Start and end minutes of the maximal free runs inside a window"""
+        free = ~self.busy[window_start:window_end]
+        edges = np.diff(np.concatenate(([0], free.view(np.int8), [0])))
+        return np.flatnonzero(edges == 1) + window_start, np.flatnonzero(edges == -1) + window_start
+    
+    def mean_energy(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Average energy level (0=Low .. 2=High) over each [start, end)"""
+        return (self._energy_cumsum[ends] - self._energy_cumsum[starts]) / np.maximum(ends - starts, 1)
+    
+    def to_datetime(self, minute: int) -> datetime:
+        return self.origin + timedelta(minutes=int(minute))
+
+
+class SmartScheduler:
+    """AI-powered scheduler"""
+    
+    def __init__(self, profile: UserProfile, llm_cache: Optional[LLMCache] = None,
+                 tie_threshold: float = 5.0, llm_budget: float = 8.0, llm_client=None,
+                 stream_token_cap: int = 120, energy_model: Optional[EnergyModel] = None,
+                 prompt_top_k: int = 8, prompt_token_budget: int = 300):
+        self.profile = profile
+        # Learned energy by weekday; the profile's periods fill in where history is thin
+        self.energy_model = energy_model
+        self.llm_cache = llm_cache
+        self._llm_client = llm_client
+        # Ask the LLM only when the top local scores are this close (points out of 100)
+        self.tie_threshold = tie_threshold
+        # Seconds to wait for the LLM before the local answer wins
+        self.llm_budget = llm_budget
+        # Streamed replies are cut off after this many chunks (roughly tokens)
+        self.stream_token_cap = stream_token_cap
+        # The LLM sees at most this many candidates, in a prompt of at most this many tokens
+        self.prompt_top_k = prompt_top_k
+        self.prompt_token_budget = prompt_token_budget
+    
+    @property
+    def llm_client(self):
+        """Chat client for suggestions; the shared lazy Cohere client unless one was given"""
+        return self._llm_client or get_cohere_client()
+    
+    def find_free_slots(self, date: datetime, existing_tasks: List[Dict], min_duration: int = 30) -> List[Dict]:
+        """Find free time slots"""
+        day = date.date() if isinstance(date, datetime) else date
+        return self.find_free_slots_range(day, day, existing_tasks, min_duration)[day]
+    
+    def find_free_slots_range(self, start_date, end_date, existing_tasks: List[Dict],
+                              min_duration: int = 30) -> Dict:
+        """Find free time slots for every day from start_date to end_date in one sweep
+        
+        existing_tasks should cover the whole window (NotionAPI.get_tasks_range)
+        and may be Task records or plain dicts; tasks without a date are placed
+        on start_date. A day runs from wake time
+        to sleep time, which may fall after midnight. Returns {date: [slots]}.
+        """
+        return self.find_free_slots_for_durations(start_date, end_date, existing_tasks, [min_duration])[min_duration]
+    
+    def find_free_slots_for_durations(self, start_date, end_date, existing_tasks: List[Dict],
+                                      durations: Sequence[int]) -> Dict:
+        """Free slots for several minimum durations at once: {duration: {date: [slots]}}
+        
+        The busy mask and free runs are computed once; each duration is only
+        a vectorized length filter over the same runs.
+        """
+        with metrics.timer("slot_compute_seconds"):
+            engine, runs = self._free_runs(start_date, end_date, existing_tasks)
+        durations = list(durations)
+        
+        result = {duration: {} for duration in durations}
+        for day, run_starts, run_ends in runs:
+            lengths = run_ends - run_starts
+            scores = engine.mean_energy(run_starts, run_ends)
+            fits = lengths[:, None] >= np.asarray(durations)[None, :]
+            
+            for col, duration in enumerate(durations):
+                result[duration][day] = [
+                    {
+                        'start': engine.to_datetime(run_starts[i]),
+                        'end': engine.to_datetime(run_ends[i]),
+                        'duration': int(lengths[i]),
+                        'energy': ENERGY_LEVELS[int(np.floor(scores[i] + 0.5))],
+                        'energy_score': round(float(scores[i]) / 2, 3)
+                    }
+                    for i in np.flatnonzero(fits[:, col])
+                ]
+        return result
+    
+    def _free_runs(self, start_date, end_date, existing_tasks: List[Dict]) -> tuple:
+        """Build the availability engine for a window and extract each day's free runs"""
+        start_day = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_day = end_date.date() if isinstance(end_date, datetime) else end_date
+        days = [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+        
+        engine = AvailabilityEngine(start_day, len(days), self._energy_table())
+        wake = self.profile.wake_time.hour * 60 + self.profile.wake_time.minute
+        sleep = self.profile.sleep_time.hour * 60 + self.profile.sleep_time.minute
+        if sleep <= wake:
+            sleep += MINUTES_PER_DAY
+        work_start = self.profile.work_start.hour * 60 + self.profile.work_start.minute
+        work_end = self.profile.work_end.hour * 60 + self.profile.work_end.minute
+        if work_end <= work_start:
+            work_end += MINUTES_PER_DAY
+        
+        offsets = np.arange(len(days)) * MINUTES_PER_DAY
+        busy_starts = [offsets + work_start - self.profile.commute_to_work]
+        busy_ends = [offsets + work_end + self.profile.commute_from_work]
+        
+        task_starts, task_ends = [], []
+        for task in existing_tasks:
+            if not isinstance(task, Task):
+                task = Task.from_dict(task)
+            # Unscheduled and unreadable rows (task.error) occupy no time
+            start = task.absolute_start(start_day)
+            if start is not None:
+                task_starts.append(start)
+                task_ends.append(start + task.end_minute - task.start_minute)
+        busy_starts.append(np.asarray(task_starts, dtype=np.int64))
+        busy_ends.append(np.asarray(task_ends, dtype=np.int64))
+        engine.add_busy(np.concatenate(busy_starts), np.concatenate(busy_ends))
+        
+        runs = []
+        for i, day in enumerate(days):
+            run_starts, run_ends = engine.free_runs(offsets[i] + wake, offsets[i] + sleep)
+            runs.append((day, run_starts, run_ends))
+        return engine, runs
+    
+    def _energy_by_minute(self) -> np.ndarray:
+        """Energy level index (0=Low, 1=Medium, 2=High) for each minute of the day"""
+        key = (tuple(self.profile.high_energy_periods), tuple(self.profile.low_energy_periods))
+        if getattr(self, '_energy_key', None) != key:
+            minutes = np.arange(MINUTES_PER_DAY)
+            levels = np.ones(MINUTES_PER_DAY, dtype=np.int8)
+            # High is applied last so it wins where the periods overlap
+            for periods, level in ((self.profile.low_energy_periods, 0), (self.profile.high_energy_periods, 2)):
+                for start, end in periods:
+                    in_period = (minutes >= start.hour * 60 + start.minute) & (minutes <= end.hour * 60 + end.minute)
+                    levels[in_period] = level
+            self._energy_key = key
+            self._energy_levels = levels
+        return self._energy_levels
+    
+    def _energy_table(self) -> np.ndarray:
+        """Energy level index for each weekday and minute (7 x 1440), learned where there is history"""
+        if self.energy_model is None:
+            return np.broadcast_to(self._energy_by_minute(), (7, MINUTES_PER_DAY))
+        return self.energy_model.table(self._energy_by_minute())
+    
+    def _get_energy_level(self, check_time: time, weekday: Optional[int] = None) -> str:
+        """Determine energy level (weekday 0 = Monday, default today)"""
+        weekday = datetime.now().weekday() if weekday is None else weekday
+        return ENERGY_LEVELS[self._energy_table()[weekday, check_time.hour * 60 + check_time.minute]]
+    
+    def score_slots(self, duration: int, free_slots: List[Dict], priority: str = "medium",
+                    category: str = "Personal") -> List[tuple]:
+        """Rank slots locally as (index, confidence 0-100), best first
+        
+        Blends how well the slot's average energy matches the goal (weighted
+        by priority), how snugly the required duration fits, and how early
+        the slot is. Slots shorter than `duration` are left out.
+        """
+        target = self._target_energy(priority, category) / 2
+        energy_weight = {"high": 0.6, "medium": 0.5, "low": 0.4}.get(str(priority).lower(), 0.5)
+        fit_weight = (1 - energy_weight) * 0.6
+        early_weight = 1 - energy_weight - fit_weight
+        
+        ranked = []
+        for i, slot in enumerate(free_slots):
+            if slot['duration'] < duration:
+                continue
+            energy = slot.get('energy_score', ENERGY_LEVELS.index(slot['energy']) / 2)
+            energy_match = 1 - abs(energy - target)
+            fit = duration / slot['duration']
+            earliness = 1 - i / len(free_slots)
+            score = 100 * (energy_weight * energy_match + fit_weight * fit + early_weight * earliness)
+            ranked.append((i, round(score, 1)))
+        
+        ranked.sort(key=lambda item: -item[1])
+        return ranked
+    
+    def suggest_optimal_slot(self, activity: str, duration: int, free_slots: List[Dict], priority: str = "medium",
+                             category: str = "Personal") -> Dict:
+        """Use AI to suggest best time slot
+        
+        The local scorer decides on its own unless its top candidates are
+        within tie_threshold points; only then is the LLM asked, and if it
+        has not answered within llm_budget seconds the local pick wins.
+        """
+        
+        if not free_slots:
+            return {"error": "No free slots available"}
+        
+        local, pending = self._prepare_suggestion(activity, duration, free_slots, priority, category)
+        if pending is None:
+            return local
+        prompt, cache_key, confidence = pending
+        
+        # A call that overruns the budget keeps running in the pool; its answer is discarded
+        future = _llm_executor.submit(self.llm_client.chat, message=prompt.text, model=COHERE_MODEL)
+        try:
+            with metrics.timer("llm_seconds", call="suggest_optimal_slot"):
+                response = future.result(timeout=self.llm_budget)
+        except Exception:
+            metrics.inc("llm_fallbacks_total", reason="budget_or_error")
+            return local
+        
+        try:
+            slot_num = None
+            reason = ""
+            for line in response.text.split('\n'):
+                if 'SLOT:' in line:
+                    slot_num = prompt.slot_index(int(line.split(':')[1].strip().strip('[]')))
+                elif 'REASON:' in line:
+                    reason = line.split(':', 1)[1].strip()
+            
+            if slot_num is not None:
+                if cache_key:
+                    self.llm_cache.set(cache_key, [slot_num, reason])
+                return {
+                    "slot": free_slots[slot_num],
+                    "reason": reason,
+                    "all_slots": free_slots,
+                    "confidence": confidence.get(slot_num, 0.0),
+                    "source": "llm"
+                }
+        except:
+            pass
+        
+        return local
+    
+    def suggest_optimal_slot_stream(self, activity: str, duration: int, free_slots: List[Dict],
+                                    priority: str = "medium", category: str = "Personal",
+                                    max_tokens: Optional[int] = None) -> Iterator[Dict]:
+        """suggest_optimal_slot over a streamed chat reply, yielding the result as it firms up
+        
+        The first result is yielded as soon as the SLOT line has arrived (or
+        at once when the local scorer or the cache decides), then again each
+        time more REASON text comes in; the last one yielded is final. The
+        stream is cancelled after max_tokens chunks or llm_budget seconds,
+        and the local pick is used if no valid SLOT arrived by then.
+        """
+        if not free_slots:
+            yield {"error": "No free slots available"}
+            return
+        
+        local, pending = self._prepare_suggestion(activity, duration, free_slots, priority, category)
+        if pending is None:
+            yield local
+            return
+        prompt, cache_key, confidence = pending
+        max_tokens = max_tokens or self.stream_token_cap
+        
+        chunks = queue.Queue()
+        cancel = threading.Event()
+        _llm_executor.submit(self._pump_stream, prompt.text, chunks, cancel)
+        
+        started = time_module.monotonic()
+        deadline = started + self.llm_budget
+        text, tokens, result, completed = "", 0, None, False
+        try:
+            while tokens < max_tokens:
+                try:
+                    chunk = chunks.get(timeout=max(0.0, deadline - time_module.monotonic()))
+                except queue.Empty:
+                    break
+                if chunk is None:
+                    completed = True
+                    break
+                if isinstance(chunk, Exception):
+                    break
+                tokens += 1
+                text += chunk
+                
+                if result is None:
+                    match = SLOT_PATTERN.search(text)
+                    if not match:
+                        continue
+                    slot_num = prompt.slot_index(int(match.group(1)))
+                    if slot_num is None:
+                        break
+                    metrics.observe("llm_first_slot_seconds", time_module.monotonic() - started)
+                    result = {"slot": free_slots[slot_num], "reason": "", "all_slots": free_slots,
+                              "confidence": confidence.get(slot_num, 0.0), "source": "llm"}
+                    yield dict(result)
+                
+                match = REASON_PATTERN.search(text)
+                if match and match.group(1).strip() != result["reason"]:
+                    result["reason"] = match.group(1).strip()
+                    yield dict(result)
+            else:
+                metrics.inc("llm_stream_truncated_total")
+        finally:
+            cancel.set()
+        
+        if result is None and completed:
+            match = FINAL_SLOT_PATTERN.search(text)
+            slot_num = prompt.slot_index(int(match.group(1))) if match else None
+            if slot_num is not None:
+                result = {"slot": free_slots[slot_num], "reason": "", "all_slots": free_slots,
+                          "confidence": confidence.get(slot_num, 0.0), "source": "llm"}
+        
+        if result is None:
+            metrics.inc("llm_fallbacks_total", reason="stream_budget_or_error")
+            yield local
+            return
+        
+        metrics.observe("llm_seconds", time_module.monotonic() - started, call="suggest_optimal_slot_stream")
+        if cache_key and completed:
+            self.llm_cache.set(cache_key, [free_slots.index(result["slot"]), result["reason"]])
+        yield result
+    
+    async def suggest_optimal_slot_stream_async(self, activity: str, duration: int, free_slots: List[Dict],
+                                                priority: str = "medium",
+                                                category: str = "Personal") -> AsyncIterator[Dict]:
+        """suggest_optimal_slot_stream without blocking the event loop
+        
+        The stream is read on a worker thread and each result is yielded as
+        it arrives; closing this generator early stops the reader after its
+        current chunk.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        results = asyncio.Queue()
+        stop = threading.Event()
+        
+        def read():
+            stream = self.suggest_optimal_slot_stream(activity, duration, free_slots, priority, category)
+            try:
+                for result in stream:
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(results.put_nowait, result)
+            finally:
+                stream.close()
+                loop.call_soon_threadsafe(results.put_nowait, None)
+        
+        reader = asyncio.ensure_future(asyncio.to_thread(read))
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                yield result
+        finally:
+            stop.set()
+            await reader
+    
+    def _prepare_suggestion(self, activity: str, duration: int, free_slots: List[Dict], priority: str,
+                            category: str) -> tuple:
+        """The local pick, plus (SlotPrompt, cache_key, confidence) when the LLM should break a tie
+        
+        The second item is None when the local scorer or the cache already
+        decides, or the candidates cannot fit the token budget, in which
+        case the first item is the answer.
+        """
+        ranked = self.score_slots(duration, free_slots, priority, category) or [(0, 0.0)]
+        confidence = dict(ranked)
+        best_num, best_score = ranked[0]
+        local = {
+            "slot": free_slots[best_num],
+            "reason": f"{free_slots[best_num]['energy']} energy and a good fit for {duration} minutes",
+            "all_slots": free_slots,
+            "confidence": best_score,
+            "source": "local"
+        }
+        
+        if len(ranked) == 1 or best_score - ranked[1][1] > self.tie_threshold:
+            return local, None
+        
+        cache_key = None
+        if self.llm_cache:
+            cache_key = fingerprint(activity, duration, priority, free_slots,
+                                    self.profile.high_energy_periods, self.profile.low_energy_periods,
+                                    category=category)
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                slot_num, reason = cached
+                return {"slot": free_slots[slot_num], "reason": reason, "all_slots": free_slots,
+                        "confidence": confidence.get(slot_num, 0.0), "source": "cache"}, None
+        
+        prompt = build_slot_prompt(activity, duration, priority, category, free_slots, ranked,
+                                   self.profile.high_energy_periods, self.profile.low_energy_periods,
+                                   top_k=self.prompt_top_k, token_budget=self.prompt_token_budget)
+        if prompt is None:
+            metrics.inc("llm_fallbacks_total", reason="token_budget")
+            return local, None
+        metrics.inc("llm_prompt_tokens_total", prompt.tokens)
+        
+        return local, (prompt, cache_key, confidence)
+    
+    def _pump_stream(self, prompt: str, chunks: "queue.Queue", cancel: threading.Event):
+        """Feed streamed text chunks into `chunks` until done or cancelled; None marks the end"""
+        stream = self._chat_stream(prompt)
+        try:
+            for text in stream:
+                if cancel.is_set():
+                    break
+                chunks.put(text)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            stream.close()
+            chunks.put(None)
+    
+    def _chat_stream(self, prompt: str) -> Iterator[str]:
+        """Text chunks of a streamed chat reply
+        
+        Uses chat_stream on clients that have it (Cohere SDK v5) and
+        chat(stream=True) otherwise (v4); both emit text-generation events.
+        """
+        client = self.llm_client
+        if hasattr(client, "chat_stream"):
+            events = client.chat_stream(message=prompt, model=COHERE_MODEL)
+        else:
+            events = client.chat(message=prompt, model=COHERE_MODEL, stream=True)
+        try:
+            for event in events:
+                if getattr(event, "event_type", None) == "text-generation":
+                    yield event.text
+        finally:
+            close = getattr(events, "close", None)
+            if close:
+                close()
+    
+    def schedule_goals(self, goals: List[Dict], existing_tasks: List[Dict], start_date,
+                       end_date=None, use_llm: bool = False, step: int = 15) -> Dict:
+        """Place many goals into the free time of a window in one pass
+        
+        Each goal is a dict with activity, duration, priority and category.
+        Goals are placed greedily, highest priority and longest first, at the
+        window whose average energy best matches the goal; every placement
+        removes that time from the pool so nothing is double-booked. With
+        use_llm=True a single chat call writes the reasons for the whole batch.
+        """
+        engine, runs = self._free_runs(start_date, end_date or start_date, existing_tasks)
+        segments = [(int(s), int(e)) for _, run_starts, run_ends in runs for s, e in zip(run_starts, run_ends)]
+        
+        order = sorted(range(len(goals)), key=lambda i: (
+            PRIORITY_RANK.get(str(goals[i].get('priority', 'medium')).lower(), 1),
+            -int(goals[i]['duration'])
+        ))
+        
+        placements = [None] * len(goals)
+        for i in order:
+            goal = goals[i]
+            duration = int(goal['duration'])
+            target = self._target_energy(goal.get('priority', 'medium'), goal.get('category', 'Personal'))
+            
+            best = None
+            for k, (seg_start, seg_end) in enumerate(segments):
+                if seg_end - seg_start < duration:
+                    continue
+                starts = np.arange(seg_start, seg_end - duration + 1, step)
+                scores = -np.abs(engine.mean_energy(starts, starts + duration) - target)
+                j = int(np.argmax(scores))
+                if best is None or scores[j] > best[0] + 1e-9:
+                    best = (float(scores[j]), k, int(starts[j]))
+            
+            if best is None:
+                continue
+            
+            _, k, start = best
+            seg_start, seg_end = segments.pop(k)
+            segments[k:k] = [seg for seg in ((seg_start, start), (start + duration, seg_end)) if seg[1] > seg[0]]
+            
+            energy = ENERGY_LEVELS[int(np.floor(engine.mean_energy(np.array([start]), np.array([start + duration]))[0] + 0.5))]
+            placements[i] = {
+                "goal": goal,
+                "slot": {
+                    'start': engine.to_datetime(start),
+                    'end': engine.to_datetime(start + duration),
+                    'duration': duration,
+                    'energy': energy
+                },
+                "reason": f"{energy} energy window for a {str(goal.get('priority', 'medium')).lower()}-priority "
+                          f"{goal.get('category', 'Personal')} goal"
+            }
+        
+        scheduled = [placement for placement in placements if placement]
+        if use_llm and scheduled:
+            self._explain_schedule(scheduled)
+        
+        return {
+            "placements": scheduled,
+            "unscheduled": [goal for goal, placement in zip(goals, placements) if placement is None]
+        }
+    
+    @staticmethod
+    def _target_energy(priority: str, category: str) -> int:
+        """Energy level a goal should ideally land in"""
+        target = CATEGORY_ENERGY.get(category, 1)
+        priority = str(priority).lower()
+        if priority == "high":
+            return 2
+        if priority == "low":
+            return min(target, 1)
+        return target
+    
+    def _explain_schedule(self, placements: List[Dict]):
+        """Replace local reasons with LLM ones, using one chat call for the batch"""
+        plan = "\n".join([
+            f"{i+1}. {p['goal']['activity']} ({p['goal'].get('category', 'Personal')}, "
+            f"{p['goal'].get('priority', 'medium')} priority): "
+            f"{p['slot']['start'].strftime('%a %I:%M %p')} - {p['slot']['end'].strftime('%I:%M %p')}, "
+            f"Energy: {p['slot']['energy']}"
+            for i, p in enumerate(placements)
+        ])
+        
+        prompt = f"""These goals have been scheduled. Briefly explain why each time suits its goal.
+
+{plan}
+
+Respond with one line per goal:
+GOAL [number]: [brief explanation]"""
+        
+        try:
+            with metrics.timer("llm_seconds", call="explain_schedule"):
+                response = self.llm_client.chat(message=prompt, model=COHERE_MODEL)
+            for line in response.text.split('\n'):
+                if line.strip().startswith('GOAL') and ':' in line:
+                    number, reason = line.split(':', 1)
+                    index = int(number.strip()[4:].strip()) - 1
+                    if 0 <= index < len(placements) and reason.strip():
+                        placements[index]["reason"] = reason.strip()
+        except Exception:
+            pass
+
+
+async def fetch_and_suggest(api: AsyncNotionAPI, scheduler: SmartScheduler, activity: str, duration: int,
+                            priority: str = "medium", category: str = "Personal", day: datetime = None,
+                            busy: Sequence[Task] = ()) -> AsyncIterator[Dict]:
+    """Load a day's tasks and stream a slot suggestion for them, yielding each result as it firms up
+    
+    The LLM request starts as soon as the free slots are known. `busy`
+    adds tasks Notion doesn't list yet, such as queued writes. Yields a
+    single {"error": ...} if the tasks can't be loaded or nothing is free,
+    otherwise what suggest_optimal_slot_stream yields.
+    """
+    day = day or datetime.now()
+    success, tasks = await api.get_tasks(day.strftime("%Y-%m-%d"))
+    if not success:
+        yield {"error": tasks}
+        return
+    loaded_ids = {task.id for task in tasks}
+    tasks = list(tasks) + [task for task in busy if task.id is None or task.id not in loaded_ids]
+    
+    free_slots = scheduler.find_free_slots(day, tasks, duration)
+    async for result in scheduler.suggest_optimal_slot_stream_async(activity, duration, free_slots, priority,
+                                                                    category):
+        yield result
@@ -0,0 +1,218 @@
+"""In-memory index of the tasks on each day, for conflict and duplicate checks
+
+Each day keeps its tasks sorted by start minute together with a running
+maximum of their end minutes, so "does [start, end) overlap anything?" is
+one bisect plus one lookup. Tasks are also keyed by content_key, so a task
+that is already in Notion (or being created right now) is recognized
+before anything is posted.
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+from task_record import Task
+
+IndexEntry = namedtuple("IndexEntry", "start end key activity page_id")
+
+
+class _Day:
+    """Entries of one day sorted by start, with prefix maxima of their ends"""
+
+    __slots__ = ("entries", "starts", "max_end", "max_at")
+
+    def __init__(self, entries: Iterable[IndexEntry] = ()):
+        self.entries = sorted(entries, key=lambda entry: entry.start)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.starts = [entry.start for entry in self.entries]
+        self.max_end = []
+        self.max_at = []
+        for i, entry in enumerate(self.entries):
+            if i and self.max_end[-1] >= entry.end:
+                self.max_end.append(self.max_end[-1])
+                self.max_at.append(self.max_at[-1])
+            else:
+                self.max_end.append(entry.end)
+                self.max_at.append(i)
+
+    def overlapping(self, start: int, end: int) -> Optional[IndexEntry]:
+        """An entry overlapping [start, end), if any: the one reaching furthest among those starting before end"""
+        i = bisect_left(self.starts, end)
+        if i and self.max_end[i - 1] > start:
+            return self.entries[self.max_at[i - 1]]
+        return None
+
+    def add(self, entry: IndexEntry):
+        self.entries.insert(bisect_right(self.starts, entry.start), entry)
+        self._rebuild()
+
+    def remove(self, key: str) -> List[IndexEntry]:
+        """Drop the entries with this key and return them"""
+        removed = [entry for entry in self.entries if entry.key == key]
+        if removed:
+            self.entries = [entry for entry in self.entries if entry.key != key]
+            self._rebuild()
+        return removed
+
+
+class IntervalIndex:
+    """Thread-safe per-day interval index of known tasks
+
+    A day counts as loaded once a complete list of its tasks has been given
+    to load(); only then can a missing overlap be trusted. Pages this index
+    confirmed in the last `settle` seconds survive a load that does not list
+    them yet, since Notion's query results lag a little behind creates.
+    """
+
+    def __init__(self, settle: float = 60.0):
+        self.settle = settle
+        self._days: Dict[str, _Day] = {}
+        self._loaded = set()
+        # content key -> day, and page id -> content key, for every indexed task
+        self._keys: Dict[str, str] = {}
+        self._pages: Dict[str, str] = {}
+        # content key -> when confirm() saw its page created
+        self._confirmed: Dict[str, float] = {}
+        # Reservations held for queued writes, taken over by the reserve that posts them
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def has_day(self, day: str) -> bool:
+        return day[:10] in self._loaded
+
+    def load(self, tasks: List[Task], days: Optional[Iterable[str]] = None):
+        """Replace the index for `days` (default: the days the tasks fall on) with `tasks`"""
+        by_day = {}
+        for task in tasks:
+            if task.scheduled and not task.error and task.date:
+                by_day.setdefault(task.date[:10], []).append(self._entry(task))
+        days = {day[:10] for day in days} if days is not None else set(by_day)
+
+        with self._lock:
+            recent = time.monotonic() - self.settle
+            self._confirmed = {key: at for key, at in self._confirmed.items() if at > recent}
+            for day in days:
+                entries = by_day.get(day, [])
+                old = self._days.get(day)
+                if old:
+                    for entry in old.entries:
+                        self._keys.pop(entry.key, None)
+                        self._pages.pop(entry.page_id, None)
+                    # Creates still in flight, or too recent to be listed yet, are kept
+                    listed = {entry.key for entry in entries}
+                    entries += [entry for entry in old.entries if entry.key not in listed
+                                and (entry.page_id is None or entry.key in self._confirmed)]
+                self._days[day] = _Day(entries)
+                for entry in entries:
+                    self._index_keys(entry, day)
+                self._loaded.add(day)
+
+    def upsert(self, task: Task):
+        """Add or move one task, e.g. a page seen by a mirror sync"""
+        with self._lock:
+            if task.id in self._pages:
+                self._remove_key(self._pages[task.id])
+            if task.scheduled and not task.error and task.date:
+                entry = self._entry(task)
+                self._remove_key(entry.key)
+                self._days.setdefault(task.date[:10], _Day()).add(entry)
+                self._index_keys(entry, task.date[:10])
+
+    def remove_pages(self, page_ids: Iterable[str]) -> int:
+        """Drop pages that no longer exist in Notion, returning how many were indexed"""
+        removed = 0
+        with self._lock:
+            for page_id in page_ids:
+                key = self._pages.get(page_id)
+                if key is not None:
+                    self._remove_key(key)
+                    removed += 1
+        return removed
+
+    def find(self, key: str) -> Optional[IndexEntry]:
+        """The indexed task with this content key, if any"""
+        with self._lock:
+            day = self._keys.get(key)
+            if day is None:
+                return None
+            return next((entry for entry in self._days[day].entries if entry.key == key), None)
+
+    def overlapping(self, day: str, start: int, end: int) -> Optional[IndexEntry]:
+        """A task on `day` overlapping [start, end) minutes, if any"""
+        with self._lock:
+            index = self._days.get(day[:10])
+            return index.overlapping(start, end) if index else None
+
+    def reserve(self, day: str, start: int, end: int, key: str, activity: str,
+                hold: bool = False) -> Optional[IndexEntry]:
+        """Hold [start, end) for a task about to be created
+
+        Returns the entry in the way (the same task, or one it overlaps)
+        instead, without reserving. Follow up with confirm or release.
+        hold=True keeps the span for a write that is only queued; the
+        plain reserve made when it is finally posted takes the hold over.
+        """
+        day = day[:10]
+        with self._lock:
+            if key in self._keys:
+                if not hold and key in self._held:
+                    self._held.discard(key)
+                    return None
+                return next(entry for entry in self._days[self._keys[key]].entries if entry.key == key)
+            index = self._days.setdefault(day, _Day())
+            blocking = index.overlapping(start, end)
+            if blocking:
+                return blocking
+            entry = IndexEntry(start, end, key, activity, None)
+            index.add(entry)
+            self._index_keys(entry, day)
+            if hold:
+                self._held.add(key)
+            return None
+
+    def confirm(self, key: str, page_id: Optional[str]):
+        """Record the page id of a reserved task that was created"""
+        with self._lock:
+            day = self._keys.get(key)
+            if day is None:
+                return
+            self._held.discard(key)
+            index = self._days[day]
+            entry = index.remove(key)[0]._replace(page_id=page_id or "")
+            index.add(entry)
+            self._index_keys(entry, day)
+            self._confirmed[key] = time.monotonic()
+
+    def release(self, key: str):
+        """Drop a reservation whose create failed"""
+        with self._lock:
+            self._remove_key(key)
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._loaded.clear()
+            self._keys.clear()
+            self._pages.clear()
+            self._confirmed.clear()
+            self._held.clear()
+
+    @staticmethod
+    def _entry(task: Task) -> IndexEntry:
+        return IndexEntry(task.start_minute, task.end_minute, task.content_key, task.activity, task.id or "")
+
+    def _index_keys(self, entry: IndexEntry, day: str):
+        self._keys[entry.key] = day
+        if entry.page_id:
+            self._pages[entry.page_id] = entry.key
+
+    def _remove_key(self, key: str):
+        self._held.discard(key)
+        day = self._keys.pop(key, None)
+        if day is not None:
+            for entry in self._days[day].remove(key):
+                self._pages.pop(entry.page_id, None)
@@ -0,0 +1,130 @@
+"""Memoization for LLM slot suggestions
+
+LLMCache is an in-memory LRU with TTL eviction, optionally backed by a
+SQLite file so suggestions survive restarts. Keys are fingerprints of the
+normalized prompt inputs, so identical requests skip the chat call.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from metrics import metrics
+
+
+def fingerprint(activity: str, duration: int, priority: str, free_slots: List[Dict],
+                high_energy_periods: List[tuple], low_energy_periods: List[tuple], **extra) -> str:
+    """Stable hash of the inputs that determine a slot suggestion"""
+    normalized = {
+        "activity": " ".join(activity.lower().split()),
+        "duration": int(duration),
+        "priority": str(priority).lower(),
+        "slots": [
+            [slot['start'].isoformat(timespec='minutes'), slot['end'].isoformat(timespec='minutes'),
+             int(slot['duration']), slot['energy']]
+            for slot in free_slots
+        ],
+        "high": [[s.strftime('%H:%M'), e.strftime('%H:%M')] for s, e in high_energy_periods],
+        "low": [[s.strftime('%H:%M'), e.strftime('%H:%M')] for s, e in low_energy_periods],
+        "extra": extra
+    }
+    encoded = json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class LLMCache:
+    """Thread-safe LRU + TTL cache with an optional SQLite backing store"""
+
+    def __init__(self, max_size: int = 512, ttl: float = 24 * 3600, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)"
+                )
+                self._conn.execute("DELETE FROM llm_cache WHERE stored_at < ?", (time.time() - ttl,))
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, or None on a miss or an expired entry"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._conn:
+                row = self._conn.execute(
+                    "SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (row[1], json.loads(row[0]))
+                    self._store_memory(key, entry)
+
+            if entry is None or now - entry[0] >= self.ttl:
+                if entry is not None:
+                    self._delete(key)
+                self.misses += 1
+                metrics.inc("llm_cache_total", result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        metrics.inc("llm_cache_total", result="hit")
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value"""
+        entry = (time.time(), value)
+        with self._lock:
+            self._store_memory(key, entry)
+            if self._conn:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), entry[0])
+                    )
+                    # Keep the disk store bounded to a multiple of the memory size
+                    self._conn.execute(
+                        """DELETE FROM llm_cache WHERE key NOT IN
+                           (SELECT key FROM llm_cache ORDER BY stored_at DESC LIMIT ?)""",
+                        (self.max_size * 4,)
+                    )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+            if self._conn:
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_cache")
+
+    def _store_memory(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _delete(self, key: str):
+        self._entries.pop(key, None)
+        if self._conn:
+            with self._conn:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
@@ -0,0 +1,288 @@
+"""Lightweight in-process instrumentation
+
+Counters and timers keyed by name and labels, exportable as Prometheus
+text or a JSON snapshot, with optional structured JSON log lines on the "goal_tracker.metrics" logger
+(to stderr, unless logging is already configured). When
+disabled every hook returns immediately, so instrumented hot paths cost
+one attribute check and a context variable lookup.
+
+A Streamlit rerun (or fragment rerun) runs inside a RerunScope held in a
+context variable, so counters are tallied per rerun rather than read off
+the process-wide totals that other sessions and background threads also
+move, and each session can switch collection and event logging on for
+its own reruns.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+
+logger = logging.getLogger("goal_tracker.metrics")
+
+
+class RerunScope:
+    """Counters tallied during one rerun, and whether it collects metrics and logs their events"""
+    __slots__ = ("started", "enabled", "log_events", "counters", "summary", "token", "_lock")
+
+    def __init__(self, enabled: bool, log_events: bool = False):
+        self.started = time.perf_counter()
+        self.enabled = enabled
+        self.log_events = log_events
+        self.counters: Dict[str, float] = {}
+        self.summary: Dict = {}
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value: float):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+_scope: ContextVar[Optional[RerunScope]] = ContextVar("metrics_rerun_scope", default=None)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "started")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.labels["error"] = exc_type.__name__
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of counters and timers"""
+
+    def __init__(self, enabled: bool = False, log_events: bool = False):
+        self.enabled = enabled
+        self.log_events = log_events
+        self._counters = {}
+        # (name, labels) -> [count, total seconds, max seconds]
+        self._timers = {}
+        self._lock = threading.Lock()
+        # Most recent rerun of any session, for the JSON snapshot
+        self.last_rerun = {}
+
+    @property
+    def active(self) -> bool:
+        """Whether hooks record anything here: enabled process-wide, or by the current rerun"""
+        if self.enabled:
+            return True
+        scope = _scope.get()
+        return scope is not None and scope.enabled
+
+    def timer(self, name: str, **labels):
+        """Context manager that records the duration of its block"""
+        if not self.active:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator form of timer()"""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.active:
+                    return func(*args, **kwargs)
+                with _Timer(self, name, dict(labels)):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def inc(self, name: str, value: float = 1, **labels):
+        scope = _scope.get()
+        if not (self.enabled or (scope is not None and scope.enabled)):
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if scope is not None:
+            scope.add(name, value)
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.active:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            stats = self._timers.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        scope = _scope.get()
+        if self.log_events or (scope is not None and scope.log_events):
+            _ensure_event_log()
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps({"event": name, "seconds": round(seconds, 6), **labels}, default=str))
+
+    def begin_rerun(self, enabled: Optional[bool] = None, log_events: Optional[bool] = None) -> RerunScope:
+        """Start the scope of a Streamlit rerun in the current context; end_rerun reports what it cost
+
+        enabled and log_events switch collection and JSON event lines on or
+        off for this rerun only (default: the process-wide settings). A
+        scope left open by an aborted rerun is replaced.
+        """
+        scope = RerunScope(self.enabled if enabled is None else enabled,
+                           self.log_events if log_events is None else log_events)
+        scope.token = _scope.set(scope)
+        return scope
+
+    def end_rerun(self, scope: Optional[RerunScope] = None, **labels) -> Dict:
+        """Close a rerun's scope and return its duration and Notion request count ({} if not collected)"""
+        scope = scope or _scope.get()
+        if scope is None:
+            return {}
+        try:
+            _scope.reset(scope.token)
+        except ValueError:
+            # Ended from another context than it began in
+            _scope.set(None)
+        if not (self.enabled or scope.enabled):
+            return {}
+
+        seconds = time.perf_counter() - scope.started
+        notion_calls = scope.counters.get("notion_http_requests_total", 0)
+        with _enabled_scope(scope):
+            self.observe("rerun_seconds", seconds, **labels)
+            self.inc("rerun_notion_requests_total", notion_calls, **labels)
+        scope.summary = {"seconds": round(seconds, 4), "notion_requests": int(notion_calls), **labels}
+        self.last_rerun = scope.summary
+        return scope.summary
+
+    @contextmanager
+    def rerun(self, enabled: Optional[bool] = None, log_events: Optional[bool] = None, **labels):
+        """Scope a block as a rerun, e.g. a fragment; inside a full rerun it joins that one's scope"""
+        outer = _scope.get()
+        if outer is not None:
+            yield outer
+            return
+        scope = self.begin_rerun(enabled, log_events)
+        try:
+            yield scope
+        finally:
+            self.end_rerun(scope, **labels)
+
+    def counter_total(self, name: str) -> float:
+        """Sum of a counter across all label sets"""
+        with self._lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+
+    def snapshot(self) -> Dict:
+        """Structured copy of every counter and timer"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            timers = [
+                {"name": name, "labels": dict(labels), "count": count,
+                 "total_seconds": round(total, 6), "avg_seconds": round(total / count, 6),
+                 "max_seconds": round(maximum, 6)}
+                for (name, labels), (count, total, maximum) in sorted(self._timers.items())
+            ]
+        return {"enabled": self.enabled, "counters": counters, "timers": timers, "last_rerun": self.last_rerun}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, default=str)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition: counters as-is, timers as summaries"""
+        lines = []
+        snapshot = self.snapshot()
+        seen = set()
+        for counter in snapshot["counters"]:
+            if counter["name"] not in seen:
+                lines.append(f"# TYPE {counter['name']} counter")
+                seen.add(counter["name"])
+            lines.append(f"{counter['name']}{_labels(counter['labels'])} {counter['value']}")
+        for timer in snapshot["timers"]:
+            if timer["name"] not in seen:
+                lines.append(f"# TYPE {timer['name']} summary")
+                seen.add(timer["name"])
+            lines.append(f"{timer['name']}_count{_labels(timer['labels'])} {timer['count']}")
+            lines.append(f"{timer['name']}_sum{_labels(timer['labels'])} {timer['total_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self.last_rerun = {}
+
+
+_log_lock = threading.Lock()
+_log_ready = False
+
+
+def _ensure_event_log():
+    """Make event lines visible the first time they are asked for
+
+    Nothing else configures logging, so the logger would inherit the
+    root's WARNING level and drop every event. Levels and handlers set up
+    by the embedding application are left alone.
+    """
+    global _log_ready
+    if _log_ready:
+        return
+    with _log_lock:
+        if _log_ready:
+            return
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
+        if not logger.hasHandlers():
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        _log_ready = True
+
+
+@contextmanager
+def _enabled_scope(rerun: RerunScope):
+    """A throwaway scope so a closed rerun's own totals are recorded under its settings"""
+    token = _scope.set(RerunScope(rerun.enabled, rerun.log_events))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def _labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Process-wide registry; GOAL_TRACKER_METRICS=1 turns it on at startup
+metrics = Metrics(enabled=os.environ.get("GOAL_TRACKER_METRICS") == "1")
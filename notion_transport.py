@@ -0,0 +1,144 @@
+"""Pooled HTTP transport for the Notion API
+
+One keep-alive requests.Session per transport, connect/read timeouts,
+jittered exponential backoff on 429/5xx (honoring Retry-After) and a
+token-bucket limiter that every transport in the process shares.
+"""
+
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from metrics import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+# Notion allows an average of three requests per second per integration
+NOTION_RATE_LIMIT = 3.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float = NOTION_RATE_LIMIT, capacity: float = NOTION_RATE_LIMIT):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_shared_limiter = TokenBucket()
+
+
+def get_shared_limiter() -> TokenBucket:
+    """The process-wide limiter used by transports that don't get their own"""
+    return _shared_limiter
+
+
+class NotionTransport:
+    """Keep-alive session for Notion with timeouts, retries and rate limiting"""
+
+    def __init__(self, api_key: str, base_url: str = NOTION_API_URL,
+                 timeout: tuple = (3.05, 30), max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0,
+                 limiter: Optional[TokenBucket] = None, pool_size: int = 10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.limiter = limiter or get_shared_limiter()
+
+        # Imported here so importing this module (and the scheduler core) stays cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._transient_errors = (requests.ConnectionError, requests.Timeout)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Notion-Version": NOTION_VERSION
+        })
+        # Retries are handled below so they can honor Retry-After and the limiter
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, path: str, idempotent: bool = True, **kwargs) -> "requests.Response":
+        """Send a request, retrying throttled and transient failures
+
+        Non-idempotent requests (page creation) are only retried on 429,
+        which Notion rejects before doing any work.
+        """
+        url = path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except self._transient_errors as e:
+                metrics.inc("notion_http_requests_total", method=method, status=type(e).__name__)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                metrics.inc("notion_http_retries_total", method=method)
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            metrics.observe("notion_http_seconds", time.perf_counter() - started, method=method)
+            metrics.inc("notion_http_requests_total", method=method, status=response.status_code)
+
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if not retryable or attempt >= self.max_retries:
+                return response
+
+            metrics.inc("notion_http_retries_total", method=method)
+            time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    def get(self, path: str, **kwargs) -> "requests.Response":
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> "requests.Response":
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> "requests.Response":
+        return self.request("PATCH", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
@@ -0,0 +1,81 @@
+"""Compact, token-budgeted prompts for LLM slot suggestions
+
+Only the top_k candidates from the local scorer go into the prompt, one
+line each ("1|07:30-09:30|120|H", with "Mon 01-08 " before the times
+when the candidates fall on several days), so the prompt stays the same size
+however many free slots the calendar has. Tokens are estimated at four
+characters each; candidates are dropped from the bottom of the ranking
+until the prompt fits the budget. SlotPrompt.slot_index maps the number
+the model answers with back to the caller's slot list.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+# Rough size of a token for English text and digits
+CHARS_PER_TOKEN = 4
+
+# Activities longer than this are cut, so a pasted paragraph can't crowd out the slots
+MAX_ACTIVITY_CHARS = 80
+
+
+class SlotPrompt(NamedTuple):
+    text: str
+    # Index in the caller's slot list of each numbered candidate, in prompt order
+    slots: List[int]
+    tokens: int
+
+    def slot_index(self, number: int) -> Optional[int]:
+        """Index in the caller's slot list for the 1-based number the model chose"""
+        return self.slots[number - 1] if 1 <= number <= len(self.slots) else None
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def encode_slot(number: int, slot: Dict, with_day: bool) -> str:
+    """One candidate as 'number|start-end|free minutes|energy initial'"""
+    span = f"{slot['start'].strftime('%H:%M')}-{slot['end'].strftime('%H:%M')}"
+    if with_day:
+        span = f"{slot['start'].strftime('%a %m-%d')} {span}"
+    return f"{number}|{span}|{slot['duration']}|{slot['energy'][0]}"
+
+
+def encode_periods(periods: Sequence[tuple]) -> str:
+    return ",".join(f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in periods) or "none"
+
+
+def build_slot_prompt(activity: str, duration: int, priority: str, category: str, free_slots: List[Dict],
+                      ranked: List[tuple], high_energy_periods: Sequence[tuple] = (),
+                      low_energy_periods: Sequence[tuple] = (), top_k: int = 8,
+                      token_budget: int = 300) -> Optional[SlotPrompt]:
+    """Prompt asking the model to choose among the best `top_k` of `ranked`
+
+    ranked is score_slots output, (index into free_slots, score) best
+    first, so it already only holds slots long enough for `duration`.
+    Candidates are listed in time order. Returns None when fewer than two
+    candidates fit the budget, since there is nothing left to choose.
+    """
+    activity = " ".join(str(activity).split())
+    if len(activity) > MAX_ACTIVITY_CHARS:
+        activity = activity[:MAX_ACTIVITY_CHARS - 1] + "…"
+    header = (
+        "Pick the best time slot for this activity.\n"
+        f"Activity: {activity}\n"
+        f"Duration: {duration} min | Priority: {priority} | Category: {category}\n"
+        f"Energy: high {encode_periods(high_energy_periods)}; low {encode_periods(low_energy_periods)}\n"
+    )
+    footer = "Reply exactly:\nSLOT: <#>\nREASON: <one short sentence>"
+
+    candidates = [index for index, _ in ranked[:max(top_k, 0)]]
+    while len(candidates) >= 2:
+        slots = sorted(candidates, key=lambda index: free_slots[index]['start'])
+        with_day = len({free_slots[index]['start'].date() for index in slots}) > 1
+        lines = [encode_slot(number, free_slots[index], with_day) for number, index in enumerate(slots, 1)]
+        text = f"{header}Slots (#|start-end|free min|energy H/M/L):\n" + "\n".join(lines) + f"\n{footer}"
+        tokens = estimate_tokens(text)
+        if tokens <= token_budget:
+            return SlotPrompt(text, slots, tokens)
+        # Drop the weakest candidate and try again
+        candidates.pop()
+    return None
@@ -0,0 +1,248 @@
+"""Repeating goals, expanded lazily and materialized a window at a time
+
+A RecurrenceRule turns into a generator of dates, so an open-ended rule
+costs nothing until it is read. RecurrenceEngine.advance only slots the
+occurrences inside a rolling window (14 days by default) that have not
+been placed yet, pushes them to Notion in one create_tasks call and moves
+each goal's watermark forward; the next call picks up where it stopped.
+Occurrences whose page could not be created are kept as retry days.
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from itertools import takewhile
+from typing import Dict, Iterator, List, Optional
+
+WEEKDAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recurring_goals (
+    goal_id TEXT PRIMARY KEY,
+    database_id TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    materialized_until TEXT
+);
+"""
+
+
+@dataclass
+class RecurrenceRule:
+    """When a goal repeats: every `interval` days, or on weekdays every `interval` weeks
+
+    Weekly rules use `weekdays` (0 = Monday); without them, `times_per_week`
+    spreads that many days evenly through the week, starting on the
+    weekday of `start`.
+    """
+    frequency: str = "daily"
+    start: date = field(default_factory=date.today)
+    interval: int = 1
+    weekdays: tuple = ()
+    times_per_week: Optional[int] = None
+    until: Optional[date] = None
+
+    def __post_init__(self):
+        if self.frequency not in ("daily", "weekly"):
+            raise ValueError(f"Unknown frequency {self.frequency!r}")
+        if self.interval < 1:
+            raise ValueError("interval must be at least 1")
+        if self.frequency == "weekly" and not self.weekdays:
+            count = min(max(self.times_per_week or 1, 1), 7)
+            self.weekdays = tuple(sorted({(self.start.weekday() + round(i * 7 / count)) % 7 for i in range(count)}))
+        self.weekdays = tuple(sorted(set(self.weekdays)))
+
+    def occurrences(self, start: Optional[date] = None) -> Iterator[date]:
+        """Dates the rule falls on from `start` (never before the rule's own start), lazily"""
+        day = max(start or self.start, self.start)
+        first_monday = self.start - timedelta(days=self.start.weekday())
+        while self.until is None or day <= self.until:
+            if self.frequency == "daily":
+                due = (day - self.start).days % self.interval == 0
+            else:
+                due = day.weekday() in self.weekdays and (day - first_monday).days // 7 % self.interval == 0
+            if due:
+                yield day
+            day += timedelta(days=1)
+
+    def between(self, start: date, end: date) -> Iterator[date]:
+        """Occurrences from start to end, inclusive"""
+        return takewhile(lambda day: day <= end, self.occurrences(start))
+
+    def describe(self) -> str:
+        if self.frequency == "daily":
+            text = "Daily" if self.interval == 1 else f"Every {self.interval} days"
+        else:
+            days = ", ".join(WEEKDAY_NAMES[d] for d in self.weekdays)
+            text = f"Weekly on {days}" if self.interval == 1 else f"Every {self.interval} weeks on {days}"
+        return text + (f" until {self.until.isoformat()}" if self.until else "")
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["start"] = self.start.isoformat()
+        data["until"] = self.until.isoformat() if self.until else None
+        data["weekdays"] = list(self.weekdays)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RecurrenceRule":
+        data = dict(data)
+        data["start"] = date.fromisoformat(data["start"])
+        data["until"] = date.fromisoformat(data["until"]) if data.get("until") else None
+        data["weekdays"] = tuple(data.get("weekdays") or ())
+        return cls(**data)
+
+
+@dataclass
+class RecurringGoal:
+    """A goal plus its rule
+
+    materialized_until is the last day already placed in Notion; retry_days
+    are earlier occurrences whose pages could not be created.
+    """
+    activity: str
+    duration: int
+    rule: RecurrenceRule
+    priority: str = "Medium"
+    category: str = "Personal"
+    goal_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    materialized_until: Optional[date] = None
+    retry_days: List[date] = field(default_factory=list)
+
+    def goal(self) -> Dict:
+        """The occurrence as a schedule_goals goal"""
+        return {'activity': self.activity, 'duration': self.duration,
+                'priority': self.priority, 'category': self.category}
+
+    def pending(self, end: date) -> Iterator[date]:
+        """Retry days, then occurrences after the watermark, up to `end`"""
+        yield from (day for day in sorted(self.retry_days) if day <= end)
+        after = self.materialized_until + timedelta(days=1) if self.materialized_until else None
+        yield from self.rule.between(after or self.rule.start, end)
+
+
+class RecurrenceStore:
+    """SQLite-backed recurring goals and their watermarks, per Notion database"""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def save(self, database_id: str, goal: RecurringGoal):
+        spec = {"activity": goal.activity, "duration": goal.duration, "priority": goal.priority,
+                "category": goal.category, "rule": goal.rule.to_dict(),
+                "retry_days": [day.isoformat() for day in goal.retry_days]}
+        watermark = goal.materialized_until.isoformat() if goal.materialized_until else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO recurring_goals (goal_id, database_id, spec, materialized_until) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(goal_id) DO UPDATE SET spec = excluded.spec,
+                       materialized_until = excluded.materialized_until""",
+                (goal.goal_id, database_id, json.dumps(spec), watermark)
+            )
+
+    def goals(self, database_id: str) -> List[RecurringGoal]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT goal_id, spec, materialized_until FROM recurring_goals WHERE database_id = ? ORDER BY rowid",
+                (database_id,)
+            ).fetchall()
+        goals = []
+        for goal_id, spec, watermark in rows:
+            spec = json.loads(spec)
+            rule = RecurrenceRule.from_dict(spec.pop("rule"))
+            spec["retry_days"] = [date.fromisoformat(day) for day in spec.get("retry_days", [])]
+            goals.append(RecurringGoal(rule=rule, goal_id=goal_id,
+                                       materialized_until=date.fromisoformat(watermark) if watermark else None,
+                                       **spec))
+        return goals
+
+    def remove(self, goal_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM recurring_goals WHERE goal_id = ?", (goal_id,))
+
+    def close(self):
+        self._conn.close()
+
+
+class RecurrenceEngine:
+    """Places the due occurrences of a database's recurring goals into a rolling window"""
+
+    def __init__(self, store: RecurrenceStore, horizon: int = 14):
+        self.store = store
+        self.horizon = horizon
+
+    def due(self, database_id: str, today: date) -> Dict[date, List[RecurringGoal]]:
+        """Occurrences not yet placed, from today to the end of the window, by day"""
+        end = today + timedelta(days=self.horizon - 1)
+        by_day = {}
+        for goal in self.store.goals(database_id):
+            for day in goal.pending(end):
+                if day >= today:
+                    by_day.setdefault(day, []).append(goal)
+        return dict(sorted(by_day.items()))
+
+    def advance(self, api, scheduler, today: Optional[date] = None) -> Dict:
+        """Slot and create the window's due occurrences, then move the watermarks
+
+        Reads the window's existing tasks with one range query and places each
+        day's occurrences with schedule_goals, so they avoid existing tasks and
+        each other. Nothing touches Notion when nothing is due. An occurrence
+        with no room is skipped; one whose page could not be created becomes a
+        retry day for the next call. Returns the created, skipped and failed
+        occurrences.
+        """
+        today = today or date.today()
+        end = today + timedelta(days=self.horizon - 1)
+        report = {"created": [], "skipped": [], "failed": [], "error": None}
+        due = self.due(api.database_id, today)
+        if not due:
+            return report
+
+        success, existing = api.get_tasks_range(min(due).isoformat(), max(due).isoformat())
+        if not success:
+            report["error"] = existing
+            return report
+
+        placed = []
+        for day, goals in due.items():
+            specs = [goal.goal() for goal in goals]
+            plan = scheduler.schedule_goals(specs, existing, day, day)
+            placements = {id(placement["goal"]): placement for placement in plan["placements"]}
+            for goal, spec in zip(goals, specs):
+                placement = placements.get(id(spec))
+                if placement is None:
+                    report["skipped"].append((goal.activity, day))
+                else:
+                    placed.append((goal, day, placement))
+
+        results = api.create_tasks([
+            {
+                'activity': goal.activity,
+                'date': placement['slot']['start'].strftime("%Y-%m-%d"),
+                'time_str': placement['slot']['start'].strftime('%I:%M %p'),
+                'duration': placement['slot']['duration'],
+                'energy': placement['slot']['energy'],
+                'category': goal.category
+            }
+            for goal, day, placement in placed
+        ])
+
+        retry_days = {}
+        for (goal, day, placement), result in zip(placed, results):
+            if result.success:
+                report["created"].append((goal.activity, placement["slot"]["start"]))
+            else:
+                report["failed"].append((goal.activity, day, result.error))
+                retry_days.setdefault(goal.goal_id, []).append(day)
+
+        for goal in {goal.goal_id: goal for goals in due.values() for goal in goals}.values():
+            goal.materialized_until = end
+            goal.retry_days = retry_days.get(goal.goal_id, [])
+            self.store.save(api.database_id, goal)
+        return report
@@ -0,0 +1,196 @@
+"""Local SQLite mirror of a Notion task database
+
+Pages are upserted by id and reads are served from an indexed local
+table. NotionAPI.sync_mirror keeps it current by querying only pages
+edited since the stored watermark. Pages deleted or archived in Notion
+are dropped when a refreshed day is checked against Notion's ids, and by
+a whole-database reconcile on the write flusher's thread.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from task_record import Task
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    page_id TEXT PRIMARY KEY,
+    database_id TEXT NOT NULL,
+    activity TEXT,
+    date TEXT,
+    time TEXT,
+    duration INTEGER,
+    energy TEXT,
+    status TEXT,
+    category TEXT,
+    last_edited_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_database_date ON tasks (database_id, date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    database_id TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL
+);
+"""
+
+TASK_COLUMNS = ("activity", "date", "time", "duration", "energy", "status", "category")
+
+# Columns query_page may sort by
+SORT_COLUMNS = ("date", "activity", "duration", "energy", "status", "category")
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_tasks_database_status ON tasks (database_id, status, date);
+CREATE INDEX IF NOT EXISTS idx_tasks_database_category ON tasks (database_id, category, date);
+"""
+
+
+class TaskMirror:
+    """SQLite-backed store of parsed tasks, keyed by Notion page id"""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+            if "category" not in columns:
+                # Mirrors made before categories were stored: add the column and
+                # drop the watermarks so the next sync fills it in
+                self._conn.execute("ALTER TABLE tasks ADD COLUMN category TEXT")
+                self._conn.execute("DELETE FROM sync_state")
+            self._conn.executescript(INDEXES)
+
+    def upsert(self, database_id: str, tasks: Iterable[Task]) -> int:
+        """Insert or replace tasks by page id, returning how many were written"""
+        rows = [
+            (task.id, database_id, task.activity, task.date[:10], task.time, task.duration,
+             task.energy, task.status, task.category, task.last_edited_time)
+            for task in tasks
+        ]
+        if not rows:
+            return 0
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """INSERT INTO tasks (page_id, database_id, activity, date, time, duration,
+                                      energy, status, category, last_edited_time)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(page_id) DO UPDATE SET
+                       activity = excluded.activity, date = excluded.date, time = excluded.time,
+                       duration = excluded.duration, energy = excluded.energy, status = excluded.status,
+                       category = excluded.category, last_edited_time = excluded.last_edited_time""",
+                rows
+            )
+        return len(rows)
+
+    def get_tasks(self, database_id: str, date: Optional[str] = None) -> List[Task]:
+        """Tasks for a database, optionally only those on `date` (YYYY-MM-DD)"""
+        query = f"SELECT page_id, last_edited_time, {', '.join(TASK_COLUMNS)} FROM tasks WHERE database_id = ?"
+        params = [database_id]
+        if date:
+            query += " AND date = ?"
+            params.append(date)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def get_tasks_range(self, database_id: str, start_date: str, end_date: str) -> List[Task]:
+        """Tasks dated between start_date and end_date, inclusive"""
+        query = (f"SELECT page_id, last_edited_time, {', '.join(TASK_COLUMNS)} FROM tasks "
+                 "WHERE database_id = ? AND date BETWEEN ? AND ? ORDER BY date")
+        with self._lock:
+            rows = self._conn.execute(query, (database_id, start_date, end_date)).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def query_page(self, database_id: str, status: Optional[str] = None, category: Optional[str] = None,
+                   sort: str = "date", descending: bool = False, limit: int = 50,
+                   offset: int = 0) -> Tuple[List[Task], int]:
+        """One page of tasks matching the filters, plus how many match in total"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort!r}")
+
+        where = "WHERE database_id = ?"
+        params = [database_id]
+        if status:
+            where += " AND status = ?"
+            params.append(status)
+        if category:
+            where += " AND category = ?"
+            params.append(category)
+        direction = "DESC" if descending else "ASC"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM tasks {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT page_id, last_edited_time, {', '.join(TASK_COLUMNS)} FROM tasks {where} "
+                f"ORDER BY {sort} {direction}, page_id LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [self._row_to_task(row) for row in rows], total
+
+    def distinct(self, database_id: str, column: str) -> List[str]:
+        """Values of a filterable column present in a database, sorted"""
+        if column not in ("status", "category", "energy"):
+            raise ValueError(f"Cannot list values of {column!r}")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT {column} FROM tasks WHERE database_id = ? AND {column} IS NOT NULL ORDER BY 1",
+                (database_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def page_ids(self, database_id: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT page_id FROM tasks WHERE database_id = ?", (database_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def delete(self, database_id: str, page_ids: Iterable[str]) -> List[str]:
+        """Remove tasks by page id, returning the dates they were on"""
+        params = [(database_id, page_id) for page_id in page_ids]
+        if not params:
+            return []
+        with self._lock, self._conn:
+            dates = []
+            for database, page_id in params:
+                row = self._conn.execute("SELECT date FROM tasks WHERE database_id = ? AND page_id = ?",
+                                         (database, page_id)).fetchone()
+                if row:
+                    dates.append(row[0])
+            self._conn.executemany("DELETE FROM tasks WHERE database_id = ? AND page_id = ?", params)
+        return dates
+
+    def watermark(self, database_id: str) -> Optional[str]:
+        """last_edited_time of the newest page seen by the previous sync"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark FROM sync_state WHERE database_id = ?", (database_id,)
+            ).fetchone()
+        return row['watermark'] if row else None
+
+    def set_watermark(self, database_id: str, watermark: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO sync_state (database_id, watermark, synced_at) VALUES (?, ?, ?)
+                   ON CONFLICT(database_id) DO UPDATE SET
+                       watermark = excluded.watermark, synced_at = excluded.synced_at""",
+                (database_id, watermark, time.time())
+            )
+
+    def clear(self, database_id: str):
+        """Forget every task and the watermark for a database"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks WHERE database_id = ?", (database_id,))
+            self._conn.execute("DELETE FROM sync_state WHERE database_id = ?", (database_id,))
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _row_to_task(row: sqlite3.Row) -> Task:
+        return Task(*(row[column] for column in TASK_COLUMNS),
+                    id=row['page_id'], last_edited_time=row['last_edited_time'])
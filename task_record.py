@@ -0,0 +1,162 @@
+"""Compact task record parsed once from a Notion page
+
+Task keeps the display fields plus the scheduled day and start/end minute
+precomputed, so the scheduler never re-parses time strings. Rows whose
+date or time cannot be read keep an `error` instead of being dropped.
+"""
+
+import hashlib
+import json
+from datetime import date as date_type
+from typing import Dict, Optional
+
+
+def parse_clock(text: str) -> Optional[int]:
+    """Minutes after midnight for '09:30 AM', '9:30pm' or '21:30'; None if unreadable"""
+    text = text.strip().upper()
+    suffix = None
+    if text.endswith(("AM", "PM")):
+        suffix = text[-2:]
+        text = text[:-2].strip()
+
+    hours, sep, minutes = text.partition(":")
+    if not sep or not hours.isdigit() or not minutes.isdigit() or len(minutes) != 2:
+        return None
+    hours, minutes = int(hours), int(minutes)
+    if minutes > 59:
+        return None
+
+    if suffix:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if suffix == "PM" else 0)
+    elif hours > 23:
+        return None
+    return hours * 60 + minutes
+
+
+def content_key(activity: str, day: str, start_minute: Optional[int], duration, category: str) -> str:
+    """Hash of what makes two tasks the same: activity, day, start, length and category
+
+    Activity case and spacing are ignored and the start is in minutes, so
+    '9:00 AM' and '09:00 AM' give the same key.
+    """
+    normalized = [" ".join(str(activity).lower().split()), str(day or "")[:10], start_minute,
+                  int(duration or 0), category]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+def task_content_key(task: Dict) -> str:
+    """content_key of create_task keyword arguments; an unreadable time is hashed as written"""
+    start = parse_clock(task['time_str'])
+    return content_key(task['activity'], task['date'], start if start is not None else task['time_str'],
+                       task['duration'], task.get('category', "Personal"))
+
+
+def _plain_text(parts) -> str:
+    return "".join(part.get('plain_text') or part.get('text', {}).get('content', '') for part in parts or ())
+
+
+class Task:
+    """One task row; supports task['field'] access for display code"""
+
+    __slots__ = ("id", "activity", "date", "time", "duration", "energy", "status", "category",
+                 "last_edited_time", "day", "start_minute", "end_minute", "error")
+
+    FIELDS = ("activity", "date", "time", "duration", "energy", "status", "category", "id", "last_edited_time")
+
+    def __init__(self, activity: str = "", date: str = "", time: str = "", duration: int = 0,
+                 energy: str = "Medium", status: str = "Planned", category: str = "Personal",
+                 id: Optional[str] = None, last_edited_time: Optional[str] = None):
+        self.id = id
+        self.activity = activity
+        self.date = date or ""
+        self.time = time or ""
+        self.duration = duration or 0
+        self.energy = energy
+        self.status = status
+        self.category = category
+        self.last_edited_time = last_edited_time
+
+        self.day = None
+        self.start_minute = None
+        self.end_minute = None
+        self.error = None
+        self._parse_schedule()
+
+    @classmethod
+    def from_page(cls, page: Dict) -> "Task":
+        """Build a task from a Notion page object, reading each property once"""
+        props = page['properties']
+        energy = (props.get('Energy') or {}).get('select')
+        status = (props.get('Status') or {}).get('select')
+        category = (props.get('Category') or {}).get('select')
+
+        return cls(
+            activity=_plain_text((props.get('Activity') or {}).get('title')) or 'Untitled',
+            date=((props.get('Date') or {}).get('date') or {}).get('start', ''),
+            time=_plain_text((props.get('Time') or {}).get('rich_text')),
+            duration=(props.get('Duration') or {}).get('number') or 0,
+            energy=energy['name'] if energy else 'Medium',
+            status=status['name'] if status else 'Planned',
+            category=category['name'] if category else 'Personal',
+            id=page.get('id'),
+            last_edited_time=page.get('last_edited_time')
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Task":
+        return cls(**{key: data[key] for key in cls.FIELDS if key in data})
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    @property
+    def content_key(self) -> str:
+        return content_key(self.activity, self.date, self.start_minute, self.duration, self.category)
+
+    @property
+    def scheduled(self) -> bool:
+        """Whether the task occupies a known span of time"""
+        return self.start_minute is not None
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self) -> str:
+        return f"Task({self.activity!r}, date={self.date!r}, time={self.time!r}, duration={self.duration})"
+
+    def _parse_schedule(self):
+        if self.date:
+            try:
+                self.day = date_type.fromisoformat(self.date[:10])
+            except ValueError:
+                self.error = f"Unreadable date '{self.date}'"
+                return
+
+        if not self.time:
+            return
+        start = parse_clock(self.time)
+        if start is None:
+            self.error = f"Unreadable time '{self.time}'"
+            return
+        try:
+            duration = int(self.duration)
+        except (TypeError, ValueError):
+            self.error = f"Unreadable duration '{self.duration}'"
+            return
+        self.start_minute = start
+        self.end_minute = start + max(duration, 0)
+
+    def absolute_start(self, origin: date_type) -> Optional[int]:
+        """Start as minutes after midnight of `origin`; undated tasks count as on `origin`"""
+        if self.start_minute is None:
+            return None
+        days = (self.day - origin).days if self.day else 0
+        return days * 24 * 60 + self.start_minute
@@ -0,0 +1,41 @@
+"""Shared fixtures: the fake Notion server and clients pointed at it"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fake_services import FakeNotionServer  # noqa: E402
+from goal_tracker import NotionAPI  # noqa: E402
+from notion_transport import NotionTransport, TokenBucket  # noqa: E402
+
+
+@pytest.fixture
+def notion_server():
+    with FakeNotionServer() as server:
+        yield server
+
+
+def make_transport(server: FakeNotionServer, **kwargs) -> NotionTransport:
+    """A transport with a limiter of its own and millisecond backoff, so tests don't wait on Notion's rate"""
+    kwargs.setdefault("backoff_base", 0.001)
+    kwargs.setdefault("limiter", TokenBucket(rate=1000, capacity=1000))
+    return NotionTransport(server.token, base_url=server.url, **kwargs)
+
+
+@pytest.fixture
+def make_api(notion_server):
+    """Build NotionAPI clients for the fake database; their transports are closed afterwards"""
+    clients = []
+
+    def build(cls=NotionAPI, **kwargs):
+        api = cls(notion_server.token, notion_server.database_id, transport=make_transport(notion_server), **kwargs)
+        clients.append(api)
+        return api
+
+    yield build
+    for api in clients:
+        api.transport.close()
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from datetime import datetime
+
+from conftest import make_transport
+from fake_services import FakeCohereClient, FakeNotionServer, make_page
+from goal_tracker import AsyncNotionAPI, NotionAPI, SmartScheduler, TaskCache, UserProfile, fetch_and_suggest
+from notion_transport import NotionTransport, TokenBucket
+from task_record import Task
+
+
+def make_scheduler(client):
+    return SmartScheduler(UserProfile(), llm_client=client, tie_threshold=100)
+
+
+async def collect(agen):
+    return [result async for result in agen]
+
+
+def test_prefetch_overlaps_the_requests():
+    with FakeNotionServer(latency=0.2) as server:
+        api = NotionAPI(server.token, server.database_id, transport=make_transport(server), cache=TaskCache())
+        server.add_page(make_page("Gym", "2024-01-08", "09:00 AM", 60))
+
+        started = time.monotonic()
+        results = asyncio.run(AsyncNotionAPI(api).prefetch(["2024-01-08", "2024-01-09", "2024-01-10"]))
+        elapsed = time.monotonic() - started
+        api.transport.close()
+
+    assert [len(tasks) for _, tasks in results] == [1, 0, 0]
+    assert elapsed < 0.5
+    # The cache is warm for each day afterwards
+    assert api.cache.get(api.database_id, "2024-01-09") == []
+
+
+def test_fetch_and_suggest_streams_a_slot_for_the_days_tasks(notion_server, make_api):
+    notion_server.add_page(make_page("Meeting", "2024-01-08", "11:00 AM", 60))
+    client = FakeCohereClient("SLOT: 2\nREASON: The evening is long and quiet")
+    results = asyncio.run(collect(fetch_and_suggest(AsyncNotionAPI(make_api()), make_scheduler(client), "Read", 30,
+                                                    day=datetime(2024, 1, 8))))
+
+    first, last = results[0], results[-1]
+    assert first["source"] == "llm"
+    assert last["slot"]["start"] == datetime(2024, 1, 8, 17, 30)
+    assert last["reason"] == "The evening is long and quiet"
+
+
+def test_fetch_and_suggest_counts_busy_tasks_and_reports_errors(notion_server, make_api):
+    notion_server.add_page(make_page("Meeting", "2024-01-08", "11:00 AM", 60))
+    client = FakeCohereClient("SLOT: 1\nREASON: Early")
+    # A queued task fills the morning, so only the evening is left and the LLM isn't asked
+    busy = [Task("Queued", "2024-01-08", "07:00 AM", 90)]
+    results = asyncio.run(collect(fetch_and_suggest(AsyncNotionAPI(make_api()), make_scheduler(client), "Read", 30,
+                                                    day=datetime(2024, 1, 8), busy=busy)))
+    assert results[-1]["slot"]["start"] == datetime(2024, 1, 8, 17, 30)
+    assert client.calls == []
+
+    transport = NotionTransport("wrong-token", base_url=notion_server.url, backoff_base=0.001,
+                                limiter=TokenBucket(rate=1000, capacity=1000))
+    api = NotionAPI("wrong-token", notion_server.database_id, transport=transport)
+    [result] = asyncio.run(collect(fetch_and_suggest(AsyncNotionAPI(api), make_scheduler(client), "Read", 30,
+                                                     day=datetime(2024, 1, 8))))
+    transport.close()
+    assert result["error"].startswith("Error fetching tasks")
+
+
+def test_closing_the_async_stream_stops_reading():
+    scheduler = SmartScheduler(UserProfile())
+    slots = scheduler.find_free_slots(datetime(2024, 1, 8), [{'date': '2024-01-08', 'time': '11:00 AM',
+                                                              'duration': 60}], 30)
+    client = FakeCohereClient("SLOT: 2\nREASON: " + "word " * 200, token_latency=0.01)
+
+    async def first_result():
+        stream = make_scheduler(client).suggest_optimal_slot_stream_async("Read", 30, slots)
+        result = await stream.__anext__()
+        await stream.aclose()
+        return result
+
+    started = time.monotonic()
+    result = asyncio.run(first_result())
+    assert result["slot"] is slots[1]
+    assert time.monotonic() - started < 1.0
+    assert client.streamed_tokens < 50
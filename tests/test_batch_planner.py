@@ -0,0 +1,44 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from batch_planner import plan_all, plan_record
+
+
+def record(record_id, *goals):
+    return {"id": record_id, "goals": list(goals) or [{"activity": "Gym", "duration": 60}]}
+
+
+def test_plans_a_record():
+    result = plan_record(record("r1"), "2024-01-08", 1)
+    assert result["id"] == "r1" and "error" not in result
+    assert [placement["activity"] for placement in result["placements"]] == ["Gym"]
+
+
+@pytest.mark.parametrize("goals, error", [
+    ("Gym", "goals must be a list of objects with an activity and a duration"),
+    (["Gym"], "each goal must be an object, not str"),
+    ([{"duration": 30}], "each goal needs an activity"),
+    ([{"activity": "Gym"}], "goal 'Gym' needs a duration in whole minutes above 0, not None"),
+    ([{"activity": "Gym", "duration": -30}], "goal 'Gym' needs a duration in whole minutes above 0, not -30"),
+    ([{"activity": "Gym", "duration": True}], "goal 'Gym' needs a duration in whole minutes above 0, not True"),
+])
+def test_malformed_goals_are_reported_not_raised(goals, error):
+    assert plan_record({"id": "r2", "goals": goals}, "2024-01-08", 1) == {"id": "r2", "error": error}
+
+
+def test_malformed_records_are_reported_not_raised():
+    assert plan_record(["not", "a", "record"], "2024-01-08", 1)["error"] == "Record must be an object, not list"
+    result = plan_record(dict(record("r3"), start_date="next week"), "2024-01-08", 1)
+    assert result["error"].startswith("ValueError")
+
+
+def test_pool_keeps_input_order_and_isolates_bad_records():
+    records = [record(i) for i in range(7)] + [record("bad", {"duration": 30})] + [record(i) for i in range(7, 10)]
+    expected = [result["id"] for result in plan_all(records, "2024-01-08", 1, workers=1)]
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        for _ in range(2):
+            results = list(plan_all(records, "2024-01-08", 1, workers=2, pool=pool))
+            assert [result["id"] for result in results] == expected
+            assert [result["id"] for result in results if "error" in result] == ["bad"]
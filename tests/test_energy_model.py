@@ -0,0 +1,64 @@
+from datetime import date
+
+import numpy as np
+
+from energy_model import EnergyModel
+from fake_services import make_page
+from task_mirror import TaskMirror
+from task_record import Task
+
+TODAY = date(2024, 2, 1)
+FLAT = np.ones(24 * 60, dtype=np.int8)
+
+
+def history(count, status, time_str="09:00 AM", day="2024-01-08"):
+    return [Task("Focus", day, time_str, 30, status=status, id=f"{time_str}-{status}-{i}") for i in range(count)]
+
+
+def test_bins_above_and_below_the_overall_rate():
+    model = EnergyModel(min_samples=5).fit(history(10, "✅ Done") + history(10, "📝 Planned", "03:00 PM"), TODAY)
+    table = model.table(FLAT)
+
+    assert table.shape == (7, 24 * 60)
+    monday = table[0]
+    assert monday[9 * 60] == 2 and monday[15 * 60] == 0
+    # No history: the profile's level
+    assert monday[20 * 60] == 1 and table[1, 9 * 60] == 1
+
+
+def test_future_tasks_count_once_their_day_is_over():
+    model = EnergyModel()
+    model.update(history(3, "📝 Planned", day="2024-02-05"), TODAY)
+    assert model.samples == 0
+    model.update([], date(2024, 2, 6))
+    assert model.samples == 3
+
+
+def test_pages_seen_again_replace_their_earlier_contribution():
+    model = EnergyModel()
+    [task] = history(1, "📝 Planned")
+    model.update([task], TODAY)
+    task.status = "✅ Done"
+    model.update([task], TODAY)
+    assert model.samples == 1 and np.nansum(model.rates()) == 1.0
+    model.remove([task.id])
+    assert model.samples == 0
+
+
+def test_mirror_sync_and_reconcile_feed_a_shared_model(notion_server, make_api):
+    pages = [notion_server.add_page(make_page("Focus", "2024-01-08", "09:00 AM", 30, status="✅ Done"))
+             for _ in range(3)]
+    model, mirror = EnergyModel(), TaskMirror()
+    # Like the app's session client and its write flusher
+    session = make_api(mirror=mirror, energy_model=model)
+    flusher = make_api(mirror=mirror, index=session.index, energy_model=model)
+
+    flusher.sync_mirror(force=True)
+    assert model.samples == 3
+    # The session's sync sees the last page again at the watermark; it is not counted twice
+    session.sync_mirror(force=True)
+    assert model.samples == 3
+
+    notion_server.archive_page(pages[0]["id"])
+    flusher.reconcile_mirror()
+    assert model.samples == 2
@@ -0,0 +1,115 @@
+import random
+
+from interval_index import IndexEntry, IntervalIndex, _Day
+from task_record import Task
+from write_queue import QueueFlusher, WriteQueue
+
+
+def entry(start, end, key=None):
+    return IndexEntry(start, end, key or f"{start}-{end}", "Task", "")
+
+
+def test_day_overlap_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(200):
+        day = _Day()
+        entries = []
+        for _ in range(rng.randint(0, 30)):
+            start = rng.randrange(0, 1380)
+            item = entry(start, start + rng.choice([15, 30, 60, 240]), key=str(len(entries)))
+            entries.append(item)
+            day.add(item)
+
+        for _ in range(20):
+            start = rng.randrange(0, 1400)
+            end = start + rng.randint(1, 120)
+            expected = [e for e in entries if e.start < end and e.end > start]
+            found = day.overlapping(start, end)
+            assert (found is not None) == bool(expected)
+            if found:
+                assert found.start < end and found.end > start
+
+
+def test_day_sees_long_entry_behind_short_ones():
+    # The 08:00-17:00 block ends after the 12:00 probe although the entries just before it don't
+    day = _Day([entry(480, 1020), entry(540, 570), entry(600, 630)])
+    assert day.overlapping(720, 750).start == 480
+    assert day.overlapping(1020, 1080) is None
+    # Touching ends don't overlap
+    assert _Day([entry(540, 570), entry(600, 630)]).overlapping(570, 600) is None
+
+
+def test_day_remove_rebuilds_prefix_maxima():
+    day = _Day([entry(480, 1020, "long"), entry(540, 570, "short")])
+    assert [e.key for e in day.remove("long")] == ["long"]
+    assert day.overlapping(720, 750) is None
+    assert day.overlapping(550, 560).key == "short"
+
+
+def test_reserve_confirm_release():
+    index = IntervalIndex()
+    assert index.reserve("2024-01-08", 540, 600, "a", "Gym") is None
+    # Same task again comes back as itself; an overlapping one is refused
+    assert index.reserve("2024-01-08", 540, 600, "a", "Gym").key == "a"
+    assert index.reserve("2024-01-08", 570, 630, "b", "Read").activity == "Gym"
+
+    index.confirm("a", "page-a")
+    assert index.find("a").page_id == "page-a"
+    assert index.reserve("2024-01-08", 600, 660, "b", "Read") is None
+    index.release("b")
+    assert index.find("b") is None
+    assert index.overlapping("2024-01-08", 600, 660) is None
+
+
+def test_held_reservation_is_taken_over_by_the_post():
+    index = IntervalIndex()
+    assert index.reserve("2024-01-08", 540, 600, "a", "Gym", hold=True) is None
+    # Another queued write for the same task sees the hold
+    assert index.reserve("2024-01-08", 540, 600, "a", "Gym", hold=True).page_id is None
+    # The flusher's plain reserve takes the hold over instead of reporting a duplicate
+    assert index.reserve("2024-01-08", 540, 600, "a", "Gym") is None
+    assert index.reserve("2024-01-08", 540, 600, "a", "Gym").key == "a"
+
+
+def test_load_keeps_recent_creates_and_drops_removed_pages():
+    index = IntervalIndex(settle=60.0)
+    listed = Task("Gym", "2024-01-08", "09:00 AM", 60, id="p1")
+    index.load([listed], ["2024-01-08"])
+    assert index.has_day("2024-01-08")
+
+    index.reserve("2024-01-08", 600, 630, "new", "Read")
+    index.confirm("new", "p2")
+    # A reload that doesn't list the new page yet keeps it
+    index.load([listed], ["2024-01-08"])
+    assert index.find("new").page_id == "p2"
+
+    assert index.remove_pages(["p1", "missing"]) == 1
+    assert index.overlapping("2024-01-08", 540, 600) is None
+
+
+def test_create_tasks_posts_duplicates_once_and_refuses_overlaps(notion_server, make_api):
+    api = make_api()
+    task = {'activity': 'Gym', 'date': '2024-01-08', 'time_str': '09:00 AM', 'duration': 60, 'energy': 'High'}
+    results = api.create_tasks([task, dict(task)])
+    assert all(result.success for result in results)
+    assert [result.duplicate for result in results].count(True) == 1
+
+    [result] = api.create_tasks([dict(task, activity="Read", time_str="09:30 AM")])
+    assert not result.success
+    assert result.status_code == 409 and result.error == "Overlaps 'Gym' (09:00–10:00)"
+    assert len(notion_server.pages) == 1
+
+
+def test_queued_overlap_is_refused_at_click_time(notion_server, make_api):
+    api = make_api(write_queue=WriteQueue())
+    task = {'activity': 'Write report', 'date': '2024-01-08', 'time_str': '09:00 AM', 'duration': 60,
+            'energy': 'High', 'category': 'Work'}
+    assert api.create_task(**task) == (True, "Task saved — it will appear in Notion in a moment.")
+    assert api.create_task(**task)[1].startswith("Task is already saved")
+
+    success, message = api.create_task(**dict(task, activity="Gym", time_str="09:30 AM"))
+    assert not success and message == "Overlaps 'Write report' — pick another time."
+
+    QueueFlusher(api.write_queue, api).flush()
+    assert api.write_queue.counts(api.database_id) == {"pending": 0, "sending": 0, "failed": 0, "done": 1}
+    assert len(notion_server.pages) == 1
@@ -0,0 +1,36 @@
+from fake_services import make_page
+from goal_tracker import TaskCache
+
+
+def add_pages(server, count, date="2024-01-08"):
+    for i in range(count):
+        server.add_page(make_page(f"Task {i}", date, "09:00 AM", 30))
+
+
+def test_pages_are_fetched_as_the_caller_iterates(notion_server, make_api):
+    add_pages(notion_server, 5)
+    api = make_api()
+    tasks = api.iter_tasks("2024-01-08", page_size=2)
+
+    assert next(tasks).activity == "Task 0"
+    assert len(notion_server.request_log) == 1
+    assert [task.activity for task in tasks] == [f"Task {i}" for i in range(1, 5)]
+    assert len(notion_server.request_log) == 3
+
+
+def test_only_task_properties_are_requested(notion_server, make_api):
+    add_pages(notion_server, 1)
+    list(make_api().iter_tasks())
+    params = notion_server.request_log[-1][2]
+    assert params["filter_properties"] == ["Activity", "Date", "Time", "Duration", "Energy", "Status", "Category"]
+
+
+def test_uncached_reads_keep_nothing_and_drop_the_stale_entry(notion_server, make_api):
+    add_pages(notion_server, 3)
+    api = make_api(cache=TaskCache())
+    assert len(api.get_tasks("2024-01-08")[1]) == 3
+    add_pages(notion_server, 1)
+
+    assert len(list(api.iter_tasks("2024-01-08", use_cache=False))) == 4
+    assert api.cache.get(api.database_id, "2024-01-08") is None
+    assert len(api.get_tasks("2024-01-08")[1]) == 4
@@ -0,0 +1,57 @@
+import json
+import logging
+import subprocess
+import sys
+import threading
+
+from conftest import ROOT
+from metrics import Metrics
+
+
+def test_reruns_count_only_their_own_requests():
+    metrics = Metrics()
+    counts = {}
+    barrier = threading.Barrier(2)
+
+    def session(name, requests):
+        scope = metrics.begin_rerun(enabled=True)
+        barrier.wait()
+        for _ in range(requests):
+            metrics.inc("notion_http_requests_total", method="GET", status=200)
+        barrier.wait()
+        counts[name] = metrics.end_rerun(scope)["notion_requests"]
+
+    threads = [threading.Thread(target=session, args=(name, n)) for name, n in (("a", 3), ("b", 6))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counts == {"a": 3, "b": 6}
+    # Outside any rerun and disabled process-wide: nothing is recorded
+    metrics.inc("notion_http_requests_total", method="GET", status=200)
+    assert metrics.counter_total("notion_http_requests_total") == 9
+
+
+def test_event_lines_follow_the_session_setting(caplog):
+    metrics = Metrics()
+    caplog.set_level(logging.INFO, logger="goal_tracker.metrics")
+
+    with metrics.rerun(enabled=True, log_events=True, session="a"):
+        metrics.observe("notion_api_seconds", 0.25, method="get_tasks")
+    with metrics.rerun(enabled=True, log_events=False, session="b"):
+        metrics.observe("notion_api_seconds", 0.5, method="get_tasks")
+
+    events = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [event["seconds"] for event in events if event["event"] == "notion_api_seconds"] == [0.25]
+    assert not metrics.log_events
+
+
+def test_event_lines_reach_stderr_without_logging_config():
+    script = (
+        "from metrics import Metrics\n"
+        "metrics = Metrics(enabled=True, log_events=True)\n"
+        "metrics.observe('notion_api_seconds', 0.125, method='get_tasks')\n"
+    )
+    done = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(done.stderr) == {"event": "notion_api_seconds", "seconds": 0.125, "method": "get_tasks"}
@@ -0,0 +1,60 @@
+import time
+
+from fake_services import FakeNotionServer, make_page
+from notion_transport import NotionTransport
+
+from conftest import make_transport
+
+
+def test_retries_429_and_honors_retry_after():
+    with FakeNotionServer(throttle_every=2, retry_after=0.2) as server:
+        transport = make_transport(server)
+        assert transport.get(f"/databases/{server.database_id}").status_code == 200
+
+        started = time.perf_counter()
+        response = transport.get(f"/databases/{server.database_id}")
+        elapsed = time.perf_counter() - started
+        transport.close()
+
+    assert response.status_code == 200
+    assert len(server.request_log) == 3
+    # The millisecond backoff alone would retry at once
+    assert elapsed >= 0.2
+
+
+def test_page_creation_is_retried_on_429_and_created_once():
+    with FakeNotionServer(throttle_every=2) as server:
+        transport = make_transport(server)
+        transport.get(f"/databases/{server.database_id}")
+        response = transport.post("/pages", idempotent=False, json={
+            "parent": {"database_id": server.database_id},
+            "properties": make_page("Write report", "2024-01-08", "09:00 AM", 60)
+        })
+        transport.close()
+
+    assert response.status_code == 200
+    assert [entry[:2] for entry in server.request_log[1:]] == [("POST", "/v1/pages")] * 2
+    assert len(server.pages) == 1
+
+
+def test_gives_up_after_max_retries():
+    with FakeNotionServer(throttle_every=1) as server:
+        transport = make_transport(server, max_retries=2)
+        response = transport.get(f"/databases/{server.database_id}")
+        transport.close()
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "0.0"
+    assert len(server.request_log) == 3
+
+
+def test_backoff_never_shorter_than_retry_after():
+    transport = NotionTransport("token", backoff_base=0.5, backoff_cap=1.0)
+    try:
+        for attempt in range(6):
+            assert 0 <= transport._backoff(attempt) <= 1.0
+            assert transport._backoff(attempt, "2.5") == 2.5
+            # An HTTP-date or garbage Retry-After falls back to the jittered delay
+            assert transport._backoff(attempt, "soon") <= 1.0
+    finally:
+        transport.close()
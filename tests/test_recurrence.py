@@ -0,0 +1,67 @@
+from datetime import date
+
+from goal_tracker import NotionAPI, SmartScheduler, TaskResult, UserProfile
+from recurrence import RecurrenceEngine, RecurrenceRule, RecurrenceStore, RecurringGoal
+
+MONDAY = date(2024, 1, 8)
+
+
+class FlakyNotionAPI(NotionAPI):
+    """Fails page creation for the days in fail_dates, as a Notion outage would"""
+
+    fail_dates = set()
+
+    def _post_page(self, data):
+        if data["properties"]["Date"]["date"]["start"] in self.fail_dates:
+            return TaskResult(0, False, error="Service unavailable", status_code=503)
+        return super()._post_page(data)
+
+
+def test_pending_starts_with_retry_days_then_follows_the_watermark():
+    goal = RecurringGoal("Stretch", 15, RecurrenceRule("daily", start=MONDAY),
+                         materialized_until=date(2024, 1, 10), retry_days=[date(2024, 1, 9)])
+    assert list(goal.pending(date(2024, 1, 12))) == [date(2024, 1, 9), date(2024, 1, 11), date(2024, 1, 12)]
+
+
+def test_weekly_rule_spreads_times_per_week():
+    rule = RecurrenceRule("weekly", start=MONDAY, times_per_week=3)
+    assert rule.weekdays == (0, 2, 5)
+    assert list(rule.between(MONDAY, date(2024, 1, 14))) == [MONDAY, date(2024, 1, 10), date(2024, 1, 13)]
+
+
+def test_store_round_trips_watermark_and_retry_days():
+    store = RecurrenceStore()
+    goal = RecurringGoal("Stretch", 15, RecurrenceRule("weekly", start=MONDAY, weekdays=(0, 3)),
+                         materialized_until=date(2024, 1, 21), retry_days=[date(2024, 1, 11)])
+    store.save("db", goal)
+
+    [loaded] = store.goals("db")
+    assert loaded == goal
+    assert store.goals("other") == []
+
+
+def test_advance_moves_the_watermark_and_retries_failed_days(notion_server, make_api):
+    api = make_api(FlakyNotionAPI)
+    api.fail_dates = {"2024-01-09"}
+    store = RecurrenceStore()
+    store.save(api.database_id, RecurringGoal("Stretch", 30, RecurrenceRule("daily", start=MONDAY)))
+    engine = RecurrenceEngine(store, horizon=3)
+    scheduler = SmartScheduler(UserProfile())
+
+    report = engine.advance(api, scheduler, MONDAY)
+    assert len(report["created"]) == 2
+    assert [(activity, day) for activity, day, _ in report["failed"]] == [("Stretch", date(2024, 1, 9))]
+    [goal] = store.goals(api.database_id)
+    assert goal.materialized_until == date(2024, 1, 10)
+    assert goal.retry_days == [date(2024, 1, 9)]
+
+    api.fail_dates = set()
+    report = engine.advance(api, scheduler, MONDAY)
+    assert [start.date() for _, start in report["created"]] == [date(2024, 1, 9)]
+    assert store.goals(api.database_id)[0].retry_days == []
+    assert len(notion_server.pages) == 3
+
+    # Nothing due: Notion is not asked
+    requests = len(notion_server.request_log)
+    assert engine.advance(api, scheduler, MONDAY) == {"created": [], "skipped": [], "failed": [], "error": None}
+    assert len(notion_server.request_log) == requests
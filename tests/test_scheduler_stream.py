@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from fake_services import FakeCohereClient
+from goal_tracker import SLOT_PATTERN, SmartScheduler, UserProfile
+
+
+@pytest.fixture
+def free_slots():
+    # 07:00-08:30 and 17:30-23:00 around a meeting, close enough in score to ask the LLM
+    scheduler = SmartScheduler(UserProfile())
+    existing = [{'date': '2024-01-08', 'time': '11:00 AM', 'duration': 60}]
+    slots = scheduler.find_free_slots(datetime(2024, 1, 8), existing, 30)
+    assert len(slots) == 2
+    return slots
+
+
+def make_scheduler(client, **kwargs):
+    return SmartScheduler(UserProfile(), llm_client=client, tie_threshold=100, **kwargs)
+
+
+def test_slot_pattern_waits_for_the_whole_number():
+    assert SLOT_PATTERN.search("SLOT: 1") is None
+    assert SLOT_PATTERN.search("SLOT: 12\n").group(1) == "12"
+    assert SLOT_PATTERN.search("REASON first\nSLOT: [2] because").group(1) == "2"
+
+
+def test_stream_yields_slot_before_reason_arrives(free_slots):
+    client = FakeCohereClient("SLOT: 2\nREASON: The evening is long and quiet", token_latency=0.01)
+    results = list(make_scheduler(client).suggest_optimal_slot_stream("Read", 30, free_slots))
+
+    first, last = results[0], results[-1]
+    assert first["source"] == "llm" and first["reason"] == ""
+    # Slots are numbered in time order in the prompt
+    assert first["slot"] is free_slots[1]
+    assert last["slot"] is free_slots[1]
+    assert last["reason"] == "The evening is long and quiet"
+    assert len(client.calls) == 1
+
+
+def test_stream_token_cap_falls_back_to_local(free_slots):
+    client = FakeCohereClient("Let me think about this carefully before answering.\nSLOT: 2\nREASON: Later")
+    results = list(make_scheduler(client, stream_token_cap=5).suggest_optimal_slot_stream("Read", 30, free_slots))
+
+    assert [result["source"] for result in results] == ["local"]
+
+
+def test_stream_out_of_range_slot_falls_back_to_local(free_slots):
+    client = FakeCohereClient("SLOT: 9\nREASON: Nope")
+    results = list(make_scheduler(client).suggest_optimal_slot_stream("Read", 30, free_slots))
+
+    assert results[-1]["source"] == "local"
@@ -0,0 +1,46 @@
+from fake_services import make_page
+from goal_tracker import TaskCache
+
+DB = "db"
+
+
+def test_cache_serves_days_from_a_fresh_full_listing():
+    cache = TaskCache()
+    cache.set(DB, None, [{'date': '2024-01-08'}, {'date': '2024-01-09T10:00'}])
+    assert cache.get(DB, "2024-01-09") == [{'date': '2024-01-09T10:00'}]
+    assert cache.get(DB, "2024-01-08..2024-01-09") == [{'date': '2024-01-08'}, {'date': '2024-01-09T10:00'}]
+
+
+def test_cache_entries_expire():
+    cache = TaskCache(ttl=0)
+    cache.set(DB, "2024-01-08", [])
+    assert cache.get(DB, "2024-01-08") is None
+
+
+def test_create_task_invalidates_the_day(notion_server, make_api):
+    notion_server.add_page(make_page("Gym", "2024-01-08", "09:00 AM", 60))
+    api = make_api(cache=TaskCache())
+    assert len(api.get_tasks("2024-01-08")[1]) == 1
+    requests = len(notion_server.request_log)
+    assert len(api.get_tasks("2024-01-08")[1]) == 1
+    assert len(notion_server.request_log) == requests
+
+    assert api.create_task("Read", "2024-01-08", "11:00 AM", 30, "Medium")[0]
+    assert [task.activity for task in api.get_tasks("2024-01-08")[1]] == ["Gym", "Read"]
+
+
+def test_cache_invalidation_drops_covering_ranges():
+    cache = TaskCache()
+    for key in ("2024-01-08", "2024-01-09", "2024-01-01..2024-01-31", "2024-02-01..2024-02-29", None):
+        cache.set(DB, key, [])
+    cache.set("other", "2024-01-08", [])
+
+    cache.invalidate(DB, ["2024-01-08"])
+
+    assert cache.get(DB, "2024-01-08") is None
+    assert cache.get(DB, "2024-01-01..2024-01-31") is None
+    assert cache.get(DB, "2024-01-09") == []
+    assert cache.get(DB, "2024-02-01..2024-02-29") == []
+    assert cache.get("other", "2024-01-08") == []
+    # The unfiltered listing holds every date, so it always goes
+    assert cache.get(DB) is None
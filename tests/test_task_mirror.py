@@ -0,0 +1,73 @@
+import time
+
+from fake_services import make_page
+from task_mirror import TaskMirror
+from write_queue import QueueFlusher, WriteQueue
+
+
+def test_mirror_sync_only_asks_for_pages_edited_since_the_watermark(notion_server, make_api):
+    pages = [notion_server.add_page(make_page(f"Task {i}", "2024-01-08", f"{9 + i:02d}:00 AM", 30))
+             for i in range(3)]
+    mirror = TaskMirror()
+    api = make_api(mirror=mirror)
+
+    assert api.sync_mirror(force=True) == 3
+    assert mirror.watermark(api.database_id) == pages[-1]["last_edited_time"]
+    assert "filter" not in notion_server.request_log[-1][3]
+
+    notion_server.edit_page(pages[0]["id"], {"Status": {"select": {"name": "✅ Done"}}})
+    api.sync_mirror(force=True)
+    body = notion_server.request_log[-1][3]
+    assert body["filter"]["last_edited_time"] == {"on_or_after": pages[-1]["last_edited_time"]}
+
+    statuses = {task.id: task.status for task in mirror.get_tasks(api.database_id, "2024-01-08")}
+    assert statuses[pages[0]["id"]] == "✅ Done"
+    assert mirror.watermark(api.database_id) >= pages[0]["last_edited_time"]
+    # Not forced and within sync_interval: nothing is asked
+    requests = len(notion_server.request_log)
+    assert api.sync_mirror() == 0
+    assert len(notion_server.request_log) == requests
+
+
+def test_refreshing_a_day_drops_its_pages_deleted_in_notion(notion_server, make_api):
+    pages = [notion_server.add_page(make_page(f"Task {i}", "2024-01-08", f"{9 + i:02d}:00 AM", 30))
+             for i in range(3)]
+    other_day = notion_server.add_page(make_page("Elsewhere", "2024-01-09", "09:00 AM", 30))
+    api = make_api(mirror=TaskMirror())
+    success, tasks = api.get_tasks("2024-01-08")
+    assert success and len(tasks) == 3
+
+    notion_server.archive_page(pages[1]["id"])
+    notion_server.archive_page(other_day["id"])
+    requests = len(notion_server.request_log)
+    success, tasks = api.get_tasks("2024-01-08", use_cache=False)
+
+    assert [task.activity for task in tasks] == ["Task 0", "Task 2"]
+    assert pages[1]["id"] not in api.mirror.page_ids(api.database_id)
+    assert api.index.overlapping("2024-01-08", 600, 630) is None
+    # One sync and one listing of the day's ids; the rest of the database is left to reconcile_if_due
+    listings = [body for _, _, params, body in notion_server.request_log[requests:]
+                if params.get("filter_properties") == ["title"]]
+    assert len(notion_server.request_log) - requests == 2
+    assert listings == [{"filter": {"property": "Date", "date": {"equals": "2024-01-08"}}, "page_size": 100}]
+    assert other_day["id"] in api.mirror.page_ids(api.database_id)
+
+
+def test_whole_database_reconcile_runs_on_the_flusher_at_most_once_per_interval(notion_server, make_api):
+    pages = [notion_server.add_page(make_page(f"Task {i}", f"2024-01-0{i + 1}", "09:00 AM", 30)) for i in range(3)]
+    api = make_api(mirror=TaskMirror(), write_queue=WriteQueue(), reconcile_interval=3600)
+    api.sync_mirror(force=True)
+    notion_server.archive_page(pages[0]["id"])
+
+    flusher = QueueFlusher(api.write_queue, api, interval=0.01).start()
+    deadline = time.monotonic() + 5
+    while pages[0]["id"] in api.mirror.page_ids(api.database_id) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    notion_server.archive_page(pages[1]["id"])
+    time.sleep(0.1)
+    flusher.stop()
+
+    assert api.mirror.page_ids(api.database_id) == {pages[1]["id"], pages[2]["id"]}
+    # Not due again within the interval
+    assert api.reconcile_if_due() == 0
+    assert api.reconcile_mirror() == 1
@@ -0,0 +1,99 @@
+from fake_services import make_page
+from write_queue import QueueFlusher, WriteQueue
+
+TASK = {'activity': 'Write report', 'date': '2024-01-08', 'time_str': '09:00 AM', 'duration': 60,
+        'energy': 'High', 'category': 'Work'}
+
+
+def test_enqueue_is_idempotent():
+    queue = WriteQueue()
+    assert queue.enqueue("db", TASK) == queue.enqueue("db", dict(TASK))
+    assert queue.counts("db")["pending"] == 1
+
+
+def test_interrupted_send_is_checked_after_restart(tmp_path):
+    path = str(tmp_path / "writes.db")
+    queue = WriteQueue(path)
+    queue.enqueue("db", TASK)
+    [claimed] = queue.claim("db")
+    assert not claimed["needs_check"]
+    # Crash while the entry is marked as sending
+    queue.close()
+
+    queue = WriteQueue(path)
+    assert queue.counts("db")["pending"] == 1
+    [claimed] = queue.claim("db")
+    assert claimed["needs_check"]
+    assert claimed["task"] == TASK
+
+
+def test_flusher_finds_a_page_the_crashed_send_created(tmp_path, notion_server, make_api):
+    path = str(tmp_path / "writes.db")
+    api = make_api()
+    queue = WriteQueue(path)
+    queue.enqueue(api.database_id, TASK)
+    queue.claim(api.database_id)
+    queue.close()
+    # The interrupted send did reach Notion
+    page = notion_server.add_page(make_page("Write report", "2024-01-08", "09:00 AM", 60, "High", category="Work"))
+
+    queue = WriteQueue(path)
+    # Hold the queued span as start() does after a restart
+    api.hold_task(TASK)
+    assert QueueFlusher(queue, api).flush() == 1
+
+    assert queue.counts(api.database_id)["done"] == 1
+    assert not any(path == "/v1/pages" for _, path, _, _ in notion_server.request_log)
+    assert len(notion_server.pages) == 1
+    assert api.index.find(api._task_key(TASK)[0]).page_id == page["id"]
+
+
+def test_re_adding_a_failed_task_queues_it_again(notion_server, make_api):
+    api = make_api(write_queue=WriteQueue())
+    flusher = QueueFlusher(api.write_queue, api)
+    # Notion rejects the first post outright, as it does for a 400
+    notion_server.token = "revoked"
+    assert api.create_task(**TASK)[0]
+    flusher.flush()
+    assert api.write_queue.counts(api.database_id)["failed"] == 1
+    assert api.index.find(api._task_key(TASK)[0]) is None
+
+    notion_server.token = api.api_key
+    assert api.create_task(**TASK) == (True, "Task saved — it will appear in Notion in a moment.")
+    assert api.write_queue.counts(api.database_id)["pending"] == 1
+    flusher.flush()
+
+    assert api.write_queue.counts(api.database_id)["done"] == 1
+    assert len(notion_server.pages) == 1
+    # The span belongs to the created page now, not to a leftover hold
+    assert api.index.find(api._task_key(TASK)[0]).page_id == notion_server.pages[0]["id"]
+
+
+def test_re_adding_a_task_whose_page_was_deleted_creates_it_again(notion_server, make_api):
+    api = make_api(write_queue=WriteQueue())
+    flusher = QueueFlusher(api.write_queue, api)
+    api.create_task(**TASK)
+    flusher.flush()
+    page_id = notion_server.pages[0]["id"]
+    notion_server.archive_page(page_id)
+    api.index.remove_pages([page_id])
+
+    assert api.create_task(**TASK)[1] == "Task saved — it will appear in Notion in a moment."
+    flusher.flush()
+    assert api.write_queue.counts(api.database_id)["done"] == 1
+    assert [page["archived"] for page in notion_server.pages] == [True, False]
+
+
+def test_re_adding_a_task_already_in_notion_does_not_post_it_twice(notion_server, make_api):
+    queue = WriteQueue()
+    api = make_api(write_queue=queue)
+    flusher = QueueFlusher(queue, api)
+    api.create_task(**TASK)
+    flusher.flush()
+    # A fresh client that has not loaded the day yet
+    api = make_api(write_queue=queue)
+
+    assert api.create_task(**TASK)[0]
+    QueueFlusher(queue, api).flush()
+    assert queue.counts(api.database_id)["done"] == 1
+    assert len(notion_server.pages) == 1
@@ -0,0 +1,294 @@
+"""Durable queue of Notion page writes
+
+Tasks are written to a local SQLite file first and created in Notion by a
+background QueueFlusher, so adding a task returns in milliseconds and
+survives restarts. Every task is keyed by a hash of its content: enqueuing
+the same task twice keeps one entry, and after a failure that may have
+reached Notion (timeout, 5xx, crash mid-send) the flusher looks for the
+page before posting it again.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from metrics import metrics
+from task_record import Task, task_content_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS writes (
+    key TEXT PRIMARY KEY,
+    database_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    date TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    needs_check INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    page_id TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_writes_state ON writes (database_id, state, next_attempt_at);
+"""
+
+STATES = ("pending", "sending", "failed", "done")
+
+
+def idempotency_key(database_id: str, task: Dict) -> str:
+    """Key of a create_task call: the database plus the task's content_key"""
+    return hashlib.sha256(f"{database_id}:{task_content_key(task)}".encode()).hexdigest()
+
+
+class WriteQueue:
+    """SQLite-backed queue of create_task arguments, shared by every session in the process"""
+
+    def __init__(self, path: str = ":memory:", max_attempts: int = 8, backoff_cap: float = 300.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_cap = backoff_cap
+        # Set whenever something is enqueued, so the flusher wakes up at once
+        self.ready = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            # Sends interrupted by a restart may or may not have reached Notion
+            self._conn.execute("UPDATE writes SET state = 'pending', needs_check = 1 WHERE state = 'sending'")
+
+    def enqueue(self, database_id: str, task: Dict) -> str:
+        """Store create_task keyword arguments and return their idempotency key
+
+        A task still waiting to be sent is not added again. One that failed,
+        or was created and may since have been deleted in Notion, goes back
+        to pending like retry_failed does, checked against Notion first.
+        """
+        key = idempotency_key(database_id, task)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO writes (key, database_id, task, date, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET state = 'pending', attempts = 0, needs_check = 1,
+                       next_attempt_at = 0, error = NULL, page_id = NULL, updated_at = excluded.updated_at
+                   WHERE writes.state IN ('failed', 'done')""",
+                (key, database_id, json.dumps(task), task['date'], now, now)
+            )
+        metrics.inc("write_queue_total", result="enqueued")
+        self.ready.set()
+        return key
+
+    def claim(self, database_id: str, limit: int = 10) -> List[Dict]:
+        """Mark up to `limit` due entries as sending and return them, oldest first"""
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                """SELECT key, task, needs_check, attempts FROM writes
+                   WHERE database_id = ? AND state = 'pending' AND next_attempt_at <= ?
+                   ORDER BY created_at LIMIT ?""",
+                (database_id, now, limit)
+            ).fetchall()
+            self._conn.executemany("UPDATE writes SET state = 'sending', updated_at = ? WHERE key = ?",
+                                   [(now, row['key']) for row in rows])
+        return [
+            {"key": row['key'], "task": json.loads(row['task']), "needs_check": bool(row['needs_check']),
+             "attempts": row['attempts']}
+            for row in rows
+        ]
+
+    def mark_done(self, key: str, page_id: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE writes SET state = 'done', page_id = ?, error = NULL, updated_at = ? WHERE key = ?",
+                (page_id, time.time(), key)
+            )
+        metrics.inc("write_queue_total", result="done")
+
+    def mark_failed(self, key: str, error: str, retry: bool, ambiguous: bool = False) -> str:
+        """Record a failed send, returning the entry's new state
+
+        Retryable failures go back to pending with backoff until max_attempts;
+        ambiguous ones are checked against Notion before the next post.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT attempts FROM writes WHERE key = ?", (key,)).fetchone()
+            attempts = (row['attempts'] if row else 0) + 1
+            state = "pending" if retry and attempts < self.max_attempts else "failed"
+            self._conn.execute(
+                """UPDATE writes SET state = ?, attempts = ?, error = ?, needs_check = needs_check OR ?,
+                                     next_attempt_at = ?, updated_at = ? WHERE key = ?""",
+                (state, attempts, error, int(ambiguous), now + min(self.backoff_cap, 2 ** attempts), now, key)
+            )
+        metrics.inc("write_queue_total", result="retry" if state == "pending" else "failed")
+        return state
+
+    def counts(self, database_id: Optional[str] = None) -> Dict[str, int]:
+        """Number of entries in each state"""
+        query = "SELECT state, COUNT(*) FROM writes"
+        params = ()
+        if database_id:
+            query += " WHERE database_id = ?"
+            params = (database_id,)
+        with self._lock:
+            rows = self._conn.execute(query + " GROUP BY state", params).fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    def failed(self, database_id: str) -> List[Dict]:
+        """Entries that gave up, with their last error"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, task, error, attempts FROM writes WHERE database_id = ? AND state = 'failed' "
+                "ORDER BY created_at", (database_id,)
+            ).fetchall()
+        return [{"key": row['key'], "task": json.loads(row['task']), "error": row['error'],
+                 "attempts": row['attempts']} for row in rows]
+
+    def pending(self, database_id: str) -> List[Dict]:
+        """create_task arguments of entries not yet created or given up on"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task FROM writes WHERE database_id = ? AND state IN ('pending', 'sending') ORDER BY created_at",
+                (database_id,)
+            ).fetchall()
+        return [json.loads(row['task']) for row in rows]
+
+    def unsynced_tasks(self, database_id: str, date: str) -> List[Task]:
+        """Tasks on `date` that are queued, or created so recently a cached read may not show them"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task, state, page_id FROM writes WHERE database_id = ? AND date = ? AND state != 'failed'",
+                (database_id, date)
+            ).fetchall()
+        tasks = []
+        for row in rows:
+            task = json.loads(row['task'])
+            tasks.append(Task(task['activity'], task['date'], task['time_str'], task['duration'], task['energy'],
+                              "⏳ Syncing" if row['state'] != "done" else "📝 Planned",
+                              task.get('category', "Personal"), id=row['page_id']))
+        return tasks
+
+    def retry_failed(self, database_id: str) -> int:
+        """Put failed entries back in the queue; they are checked against Notion first"""
+        with self._lock, self._conn:
+            count = self._conn.execute(
+                """UPDATE writes SET state = 'pending', attempts = 0, needs_check = 1, next_attempt_at = 0
+                   WHERE database_id = ? AND state = 'failed'""", (database_id,)
+            ).rowcount
+        self.ready.set()
+        return count
+
+    def purge_done(self, older_than: float = 24 * 3600) -> int:
+        """Forget entries created in Notion more than `older_than` seconds ago"""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM writes WHERE state = 'done' AND updated_at < ?",
+                                      (time.time() - older_than,)).rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+class QueueFlusher:
+    """Background thread that drains one database's entries through NotionAPI.create_tasks
+
+    Batches go through the API's transport, so they share its rate limiter.
+    Queued tasks keep their span held in the API's interval index until
+    they are created or given up on. Between batches it also runs the API's
+    periodic mirror reconcile.
+    """
+
+    def __init__(self, queue: WriteQueue, api, batch_size: int = 10, interval: float = 5.0):
+        self.queue = queue
+        self.api = api
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "QueueFlusher":
+        if self._thread is None or not self._thread.is_alive():
+            # Holds are in memory, so entries queued before a restart are held again
+            for task in self.queue.pending(self.api.database_id):
+                self.api.hold_task(task)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="notion-write-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self.queue.ready.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def flush(self) -> int:
+        """Send every entry that is due now, returning how many were processed"""
+        processed = 0
+        while True:
+            batch = self.queue.claim(self.api.database_id, self.batch_size)
+            if not batch:
+                return processed
+            self._send(batch)
+            processed += len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.queue.ready.clear()
+            try:
+                self.flush()
+                self.queue.purge_done()
+                # The whole-database check for deleted pages runs here, off every session's rerun
+                self.api.reconcile_if_due()
+            except Exception as e:
+                # Keep the thread alive; claimed entries are recovered as ambiguous on restart
+                metrics.inc("write_queue_errors_total", error=type(e).__name__)
+            self.queue.ready.wait(self.interval)
+
+    def _send(self, batch: List[Dict]):
+        to_post = []
+        for entry in batch:
+            if entry["needs_check"]:
+                # The previous attempt may have created the page even though it reported failure
+                try:
+                    page_id = self.api.find_page(entry["task"]['activity'], entry["task"]['date'],
+                                                 entry["task"]['time_str'])
+                except Exception as e:
+                    self._retry(entry, f"Checking for an existing page: {e}")
+                    continue
+                if page_id:
+                    self.queue.mark_done(entry["key"], page_id)
+                    self.api.index.confirm(task_content_key(entry["task"]), page_id)
+                    continue
+            to_post.append(entry)
+
+        if not to_post:
+            return
+        results = self.api.create_tasks([entry["task"] for entry in to_post])
+        for entry, result in zip(to_post, results):
+            if result.success:
+                self.queue.mark_done(entry["key"], result.page_id)
+            elif result.status_code is None or result.status_code >= 500:
+                # Timed out or failed server-side: Notion may still have created the page
+                self._retry(entry, result.error or "Unknown error", ambiguous=True)
+            elif result.status_code == 429:
+                self._retry(entry, result.error or "Rate limited")
+            else:
+                self.queue.mark_failed(entry["key"], f"Error {result.status_code}: {result.error}", retry=False)
+
+    def _retry(self, entry: Dict, error: str, ambiguous: bool = False):
+        """Put an entry back for another attempt, holding its span again unless it gave up"""
+        if self.queue.mark_failed(entry["key"], error, retry=True, ambiguous=ambiguous) == "pending":
+            self.api.hold_task(entry["task"])
+        else:
+            # Gave up: free a span still held for it, but not a page the index knows exists
+            key = task_content_key(entry["task"])
+            held = self.api.index.find(key)
+            if held and held.page_id is None:
+                self.api.index.release(key)